@@ -1,5 +1,5 @@
 from flask import Flask, render_template, request, redirect, url_for
-from smartinvest import DataDriver, StockQASystem, StockPlotter, Predictor
+from smartinvest import DataDriver, StockQASystem, StockPlotter, Predictor, PredictionCache, latest_model_path
 import os
 from datetime import datetime, timedelta
 import pandas as pd
@@ -15,7 +15,28 @@ data_driver = DataDriver(data_folder=data_folder)
 qa_system = None
 
 # Initialize Predictor
-predictor = Predictor(data_driver, model_path='smartinvest/model/exp_1.4_20250518.keras')
+# PREDICTOR_MODEL_FOLDER=smartinvest/model/walk_forward serves the newest model retrained
+# by train/walk_forward.py, picked when the app starts
+# PREDICTOR_BACKEND=numpy runs the model without loading TensorFlow
+model_folder = os.getenv('PREDICTOR_MODEL_FOLDER')
+model_path = latest_model_path(model_folder) if model_folder else None
+if model_folder and model_path is None:
+    print(f"No model found in {model_folder}, using the default model")
+predictor = Predictor(data_driver, model_path=model_path or 'smartinvest/model/exp_1.4_20250518.keras',
+                      backend=os.getenv('PREDICTOR_BACKEND', 'keras'))
+print(f"SERVING MODEL: {predictor.model_path}")
+
+# Build the close matrix and the features once, before the background refresh
+# and the QA system read them, so they never build them concurrently
+try:
+    data_driver.warm_up()
+except Exception as e:
+    print(f"Error building features: {str(e)}")
+
+# Predictions only change when the data does: serve them from a cache
+# that is recomputed in the background after each download/refresh
+prediction_cache = PredictionCache(predictor)
+prediction_cache.refresh_async()
 
 def initialize_qa_system():
     """
@@ -69,8 +90,7 @@ def index():
         
         if action == 'get_prediction':
             try:
-                prediction_results = predictor.get_prediction()
-                prediction_chart = predictor.plot_predictions(prediction_results)
+                prediction_results, prediction_chart = prediction_cache.get()
                 result = prediction_results.to_html(classes='table table-striped', index=False)
                 result_type = 'prediction'
             except Exception as e:
@@ -108,6 +128,7 @@ def index():
                             # Download data for specified year
                             data_driver.download_database([stock_id], year, force_replace=False)
                             download_message = f"Successfully downloaded data for {stock_id} for year {year}"
+                            prediction_cache.refresh_async()
                             
                             # Update QA system with new data
                             if qa_system:
@@ -169,10 +190,14 @@ def refresh():
         # Get all available stocks
         stocks = data_driver.get_available_stocks()
         if stocks:
-            # Download data for current year
-            current_year = datetime.now().year
-            data_driver.download_database(stocks, current_year, force_replace=True)
-            refresh_message = "Data refreshed successfully"
+            # Download only the days missing since the last stored date
+            results = data_driver.refresh_database(stocks)
+            failed = [stock for stock, r in results.items() if r.status == 'failed']
+            if failed:
+                refresh_message = f"Error refreshing data for: {', '.join(failed)}"
+            else:
+                refresh_message = "Data refreshed successfully"
+            prediction_cache.refresh_async()
             
             # Update QA system with refreshed data
             if qa_system:
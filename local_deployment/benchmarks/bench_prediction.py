@@ -0,0 +1,290 @@
+"""
+Stage-level benchmark of the prediction pipeline.
+
+Generates a synthetic data/<STOCK>/<YEAR> tree, then times and memory-profiles
+each stage of the path Predictor.get_prediction uses, from the stored
+partitions to the chart:
+
+    close_matrix  scan of the close prices into the close matrix (update_close_matrix)
+    features      full build of the feature store from the close matrix (update_features)
+    incremental   update_features after one new day, as after a daily refresh
+    get_features  read of the returns feature over the whole period
+    window        sliding windows + validity check
+    predict       forward pass of the production model over every window
+    plot          plot_predictions PNG rendering
+
+The close matrix and the feature store are removed before every run, so each
+run builds them from scratch.
+
+The synthetic stocks are named after the model's watch list, so the predict
+stage runs the shipped model on its real input shape. Watch list stocks beyond
+`--stocks` are fed zero returns. The NumPy backend needs TensorFlow once to
+export `<model>.npz` next to the model, after that the benchmark runs without it.
+
+Usage (from local_deployment/):
+    python -m benchmarks.bench_prediction --stocks 30 100 --years 1 5 --output bench.json
+    python -m benchmarks.bench_prediction --baseline benchmarks/baseline.json
+    python -m benchmarks.bench_prediction --baseline benchmarks/baseline.json --update-baseline
+
+benchmarks/baseline.json holds reference results of the default configs.
+Timings depend on the machine, so compare against a baseline recorded on the
+same machine: run once with --update-baseline (or with a --baseline path that
+does not exist yet) before changing the code, then again without it.
+"""
+import os
+import glob
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from smartinvest.datadriver.data_driver import DataDriver
+from smartinvest.datadriver.storage import write_partition
+from smartinvest.datadriver.manifest import get_manifest
+from smartinvest.predictor.prediction import (Predictor, WATCH_LIST, load_model, load_model_info,
+                                              model_len_x)
+from smartinvest.processing.feature_engineering import get_X
+
+DEFAULT_MODEL = 'smartinvest/model/exp_1.4_20250518.keras'
+FIRST_YEAR = 2005
+
+def stock_names(n_stocks, watch_list):
+    """
+    Name `n_stocks` synthetic stocks: the watch list first, then S000, S001, ...
+    """
+    extra = [f"S{i:03d}" for i in range(max(n_stocks - len(watch_list), 0))]
+    return (list(watch_list) + extra)[:n_stocks]
+
+def synthetic_frames(stocks, n_years, seed=0):
+    """
+    Build random-walk OHLCV data for `stocks` over `n_years` of business days.
+
+    Returns:
+        dict: Stock symbol -> DataFrame indexed by date
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(f"{FIRST_YEAR}-01-01", f"{FIRST_YEAR + n_years - 1}-12-31", name='time')
+    frames = {}
+    for stock in stocks:
+        # Each stock misses ~2% of the days, like suspended trading sessions
+        traded = dates[rng.random(len(dates)) > 0.02]
+        close = 10000 * np.cumprod(1 + rng.normal(0, 0.02, len(traded)))
+        frames[stock] = pd.DataFrame({
+            'Open': close * (1 + rng.normal(0, 0.005, len(traded))),
+            'High': close * 1.01,
+            'Low': close * 0.99,
+            'Close': close,
+            'Volume': rng.integers(1000, 10_000_000, len(traded)),
+        }, index=traded)
+    return frames
+
+def generate_store(data_folder, stocks, n_years, storage_format='parquet', seed=0):
+    """
+    Write a synthetic data/<STOCK>/<YEAR> tree in a throwaway folder, recording
+    every partition in its manifest.
+
+    Returns:
+        DataDriver: Driver over the generated folder
+    """
+    frames = synthetic_frames(stocks, n_years, seed)
+    with get_manifest(data_folder).batch():
+        for stock, data in frames.items():
+            data['ticker'] = stock
+            for year, year_data in data.groupby(data.index.year):
+                write_partition(year_data, os.path.join(data_folder, stock, str(year)), '20240101000000',
+                                storage_format=storage_format)
+    return DataDriver(data_folder, storage_format=storage_format, cache_bytes=None)
+
+def remove_derived_data(data_driver):
+    """
+    Remove the close matrix and the feature store, so the next run builds them again.
+    """
+    close_matrix = data_driver.close_matrix
+    for file_path in glob.glob(os.path.join(close_matrix.folder, f"{close_matrix.name}*")):
+        os.remove(file_path)
+    shutil.rmtree(data_driver.feature_store.folder, ignore_errors=True)
+
+def load_production_model(model_path, backend='numpy'):
+    """
+    Load the model served by the app with its watch list and window length.
+
+    Returns:
+        tuple: (model, watch list, len_x)
+    """
+    try:
+        model = load_model(model_path, backend=backend)
+    except ImportError:
+        raise SystemExit(f"Loading {model_path} with the '{backend}' backend needs TensorFlow "
+                         f"(the NumPy backend only once, to export the .npz)")
+    info = load_model_info(model_path)
+    return model, list(info.get('stocks', WATCH_LIST)), model_len_x(model, info, Predictor.len_x)
+
+def model_input(X, stocks, model_stocks):
+    """
+    Select the model's stocks from windows over `stocks`, with zero returns for
+    model stocks that are not in the data.
+
+    Returns:
+        np.ndarray: Array of shape (n_windows, len_x, len(model_stocks))
+    """
+    columns = {s: i for i, s in enumerate(stocks)}
+    present = [j for j, s in enumerate(model_stocks) if s in columns]
+    if len(present) == len(model_stocks):
+        return X[..., [columns[s] for s in model_stocks]]
+    out = np.zeros(X.shape[:2] + (len(model_stocks),), dtype=np.float32)
+    out[..., present] = X[..., [columns[model_stocks[j]] for j in present]]
+    return out
+
+def _run_stages(stages, trace=False, setup=None):
+    """
+    Run the stages in order, each one taking the output of the previous one.
+
+    Args:
+        stages (list): (name, function) pairs
+        trace (bool): If True, measures peak memory with tracemalloc, which slows
+            Python code down, so timings of a traced run are not comparable
+        setup (callable, optional): Called, untimed, before the first stage
+
+    Returns:
+        dict: Stage name -> seconds, or peak MB if `trace`
+    """
+    if setup is not None:
+        setup()
+    measures = {}
+    value = None
+    for i, (name, stage) in enumerate(stages):
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        value = stage() if i == 0 else stage(value)
+        seconds = time.perf_counter() - start
+        if trace:
+            measures[name] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            tracemalloc.stop()
+        else:
+            measures[name] = seconds
+    return measures
+
+def run_config(n_stocks, n_years, production_model, storage_format='parquet', repeat=3):
+    """
+    Benchmark every stage for one (n_stocks, n_years) scale.
+
+    Args:
+        production_model (tuple): (model, watch list, len_x) from `load_production_model`
+
+    Returns:
+        dict: Stage name -> {'seconds': best of `repeat`, 'peak_mb': ...}
+    """
+    model, model_stocks, len_x = production_model
+    work_dir = tempfile.mkdtemp(prefix='smartinvest_bench_')
+    try:
+        stocks = stock_names(n_stocks, model_stocks)
+        data_driver = generate_store(os.path.join(work_dir, 'data'), stocks, n_years, storage_format)
+        # The day after the stored ones, added by the incremental stage
+        last_day = data_driver.get_date_range()[1]
+        next_day = pd.DataFrame(100.0, index=[last_day + pd.offsets.BDay()], columns=stocks)
+
+        def update_close_matrix():
+            # update_close_matrix without its feature update, timed separately
+            close = data_driver.scan(stocks, columns=['Close']).collect()['Close']
+            data_driver.close_matrix.update(close)
+
+        def update_incremental():
+            data_driver.close_matrix.update(next_day)
+            return data_driver.update_features()
+
+        stages = [
+            ('close_matrix', update_close_matrix),
+            ('features', lambda _: data_driver.update_features()),
+            ('incremental', lambda _: update_incremental()),
+            ('get_features', lambda _: data_driver.get_features('returns', stocks)),
+            ('window', lambda returns: get_X(returns.to_numpy(), len_x=len_x)),
+            ('predict', lambda X: model.predict(model_input(X, stocks, model_stocks), verbose=0)),
+            ('plot', lambda y: Predictor.plot_predictions(pd.DataFrame({'stock': model_stocks, 'prediction': y[-1]}))),
+        ]
+        reset = lambda: remove_derived_data(data_driver)
+        peak_mb = _run_stages(stages, trace=True, setup=reset)
+        runs = [_run_stages(stages, setup=reset) for _ in range(repeat)]
+        results = {name: {'seconds': min(run[name] for run in runs), 'peak_mb': peak_mb[name]}
+                   for name, _ in stages}
+        results['total'] = {'seconds': sum(r['seconds'] for r in results.values()),
+                            'peak_mb': max(r['peak_mb'] for r in results.values())}
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Find stages slower than the baseline by more than `tolerance`.
+
+    Returns:
+        list: (config, stage, baseline seconds, current seconds) of each regression
+    """
+    regressions = []
+    for config, stages in results['configs'].items():
+        for stage, current in stages.items():
+            reference = baseline.get('configs', {}).get(config, {}).get(stage)
+            if reference and current['seconds'] > reference['seconds'] * (1 + tolerance):
+                regressions.append((config, stage, reference['seconds'], current['seconds']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the prediction pipeline")
+    parser.add_argument('--stocks', type=int, nargs='+', default=[30, 100])
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 5])
+    parser.add_argument('--format', default='parquet', choices=['csv', 'parquet', 'feather'])
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="model whose inference is timed")
+    parser.add_argument('--backend', default='numpy', choices=['keras', 'numpy'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default=None, help="results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument('--update-baseline', action='store_true', help="overwrite the baseline with these results")
+    args = parser.parse_args()
+
+    results = {
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpus': os.cpu_count()},
+        'format': args.format,
+        'model': args.model,
+        'backend': args.backend,
+        'configs': {},
+    }
+    production_model = load_production_model(args.model, args.backend)
+    for n_stocks in args.stocks:
+        for n_years in args.years:
+            config = f"{n_stocks}x{n_years}"
+            print(f"BENCHMARK {config}: {n_stocks} stocks, {n_years} years")
+            results['configs'][config] = run_config(n_stocks, n_years, production_model, args.format, args.repeat)
+            for stage, r in results['configs'][config].items():
+                print(f"  {stage:<12} {r['seconds'] * 1000:10.1f} ms {r['peak_mb']:10.1f} MB")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"RESULTS SAVED TO {args.output}")
+
+    if args.baseline is None:
+        return
+    if args.update_baseline or not os.path.exists(args.baseline):
+        shutil.copyfile(args.output, args.baseline)
+        print(f"BASELINE SAVED TO {args.baseline}")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != results['machine']:
+        print(f"WARNING: BASELINE RECORDED ON ANOTHER MACHINE {baseline.get('machine')}, "
+              f"run once with --update-baseline before comparing")
+    regressions = compare(results, baseline, args.tolerance)
+    for config, stage, before, after in regressions:
+        print(f"REGRESSION {config} {stage}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+    if regressions:
+        raise SystemExit(1)
+    print("NO REGRESSION")
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 from .datadriver.data_driver import DataDriver
 from .interactor.stock_qa import StockQASystem
 from .interactor.plotter import StockPlotter
-from .predictor.prediction import Predictor
+from .predictor.prediction import Predictor, latest_model_path
+from .predictor.prediction_cache import PredictionCache
 
-__all__ = ['DataDriver', 'StockQASystem', 'StockPlotter', 'Predictor'] 
\ No newline at end of file
+__all__ = ['DataDriver', 'StockQASystem', 'StockPlotter', 'Predictor', 'PredictionCache', 'latest_model_path'] 
\ No newline at end of file
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock (Windows) only the threads of one process are serialized
+    fcntl = None
+
+class FileLock:
+    """
+    Exclusive lock shared by the threads and processes writing a data folder,
+    held with flock on a lock file. Re-entrant within a thread, so a locked
+    update can call other locked updates of the same folder.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path of the lock file, created if missing
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._file = open(self.path, 'a')
+                if fcntl is not None:
+                    fcntl.flock(self._file, fcntl.LOCK_EX)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+# Locks shared per lock file, so all threads of a process use the same one
+_locks = {}
+_locks_guard = threading.Lock()
+
+def get_lock(path):
+    """
+    Get the shared FileLock of a lock file.
+    """
+    key = os.path.abspath(path)
+    with _locks_guard:
+        if key not in _locks:
+            _locks[key] = FileLock(key)
+        return _locks[key]
+
+def unique_temp_path(path, suffix='.tmp'):
+    """
+    Create an empty file with a unique name next to `path`, on the same file system
+    so it can be swapped in with os.replace.
+
+    Returns:
+        str: Path of the created file
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix=os.path.basename(path) + '.', suffix=suffix)
+    os.close(fd)
+    return tmp_path
+
+def atomic_write(path, write, mode='w'):
+    """
+    Write a file through a unique temporary file and swap it in with os.replace,
+    so readers see the old or the new content and concurrent writers never share
+    a temporary file.
+
+    Args:
+        path (str): Path of the file
+        write (callable): write(f) writes the content to the open temporary file
+        mode (str): Mode the temporary file is opened with, 'w' or 'wb'
+    """
+    tmp_path = unique_temp_path(path)
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,156 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from .atomic import atomic_write, unique_temp_path
+
+class CloseMatrix:
+    """
+    Days x tickers matrix of close prices kept on disk and opened with np.memmap.
+
+    The matrix lives next to the stock folders as two files:
+        close_matrix.<id>.f32   raw float32 values, row-major (n_days, n_stocks)
+        close_matrix.json       date and ticker index of the matrix, and the name of its values file
+
+    Updates write a new values file under a unique name, then swap in the index
+    pointing to it with a single os.replace. A reader always maps the values
+    with the shape of their own index, and readers that already mapped the old
+    file (e.g. other Flask workers) are never corrupted.
+    The feature store keeps its matrices in the same format under other names.
+    """
+    def __init__(self, data_folder, name='close_matrix'):
+        """
+        Args:
+            data_folder (str): Path to the folder containing stock data
+            name (str): File name of the matrix, without extension
+        """
+        self.folder = data_folder
+        self.name = name
+        self.index_path = os.path.join(data_folder, f"{name}.json")
+        self._values = None
+        self._dates = None
+        self._stocks = None
+        self._loaded_mtime = None
+
+    def exists(self):
+        return os.path.exists(self.index_path)
+
+    def _values_path(self, index):
+        # Matrices written before the values file was named in the index use <name>.f32
+        return os.path.join(self.folder, index.get('values_file', f"{self.name}.f32"))
+
+    def _load(self):
+        """
+        Map the matrix into memory, re-opening it if another process updated it.
+        """
+        mtime = os.stat(self.index_path).st_mtime_ns
+        if self._values is not None and mtime == self._loaded_mtime:
+            return
+
+        for attempt in range(2):
+            with open(self.index_path) as f:
+                index = json.load(f)
+            shape = (len(index['dates']), len(index['stocks']))
+            if 0 in shape:
+                values = np.empty(shape, dtype=np.float32)
+                break
+            try:
+                values = np.memmap(self._values_path(index), dtype=np.float32, mode='r', shape=shape)
+                break
+            except FileNotFoundError:
+                # A writer swapped the index and removed the values file in between: read the new index
+                if attempt:
+                    raise
+        self._dates = pd.to_datetime(index['dates'])
+        self._stocks = index['stocks']
+        self._values = values
+        self._loaded_mtime = mtime
+
+    @property
+    def stocks(self):
+        if not self.exists():
+            return []
+        self._load()
+        return list(self._stocks)
+
+    def get(self, stocks=None, start=None, end=None, last=None):
+        """
+        Get close prices as a DataFrame backed by the memory-mapped matrix.
+
+        Slicing by date only is zero-copy. Selecting a subset of stocks gathers
+        the requested columns into a new array.
+
+        Args:
+            stocks (list, optional): Stock symbols, in the order of the output columns. If None, all stocks
+            start (str, optional): First date to include
+            end (str, optional): Last date to include
+            last (int, optional): Only keep the last `last` days of the range
+
+        Returns:
+            pd.DataFrame: Close prices, shape n_days x n_stocks
+        """
+        self._load()
+        row_start = 0 if start is None else self._dates.searchsorted(pd.Timestamp(start), side='left')
+        row_end = len(self._dates) if end is None else self._dates.searchsorted(pd.Timestamp(end), side='right')
+        if last is not None:
+            row_start = max(row_start, row_end - last)
+        values = self._values[row_start:row_end]
+
+        if stocks is None or list(stocks) == self._stocks:
+            stocks = self._stocks
+        else:
+            positions = {s: i for i, s in enumerate(self._stocks)}
+            missing = [s for s in stocks if s not in positions]
+            if missing:
+                raise KeyError(f"Stocks not in {os.path.basename(self.index_path)}: {missing}")
+            values = values[:, [positions[s] for s in stocks]]
+
+        return pd.DataFrame(values, index=self._dates[row_start:row_end], columns=list(stocks), copy=False)
+
+    def update(self, close):
+        """
+        Merge new close prices into the matrix. New values override stored ones.
+
+        Args:
+            close (pd.DataFrame): Close prices indexed by date, one column per stock
+        """
+        close = close.copy()
+        close.index = pd.to_datetime(close.index)
+        close = close[~close.index.duplicated(keep='last')]
+        if self.exists():
+            close = close.combine_first(self.get())
+        self.write(close.sort_index())
+
+    def write(self, frame):
+        """
+        Replace the whole matrix with `frame`, indexed by date, one column per stock.
+        """
+        values = np.ascontiguousarray(frame.values, dtype=np.float32)
+        index = {
+            'dates': pd.to_datetime(frame.index).strftime('%Y-%m-%d').tolist(),
+            'stocks': [str(s) for s in frame.columns],
+        }
+
+        old_values_path = None
+        if self.exists():
+            with open(self.index_path) as f:
+                old_values_path = self._values_path(json.load(f))
+
+        os.makedirs(self.folder, exist_ok=True)
+        values_path = unique_temp_path(os.path.join(self.folder, self.name), suffix='.f32')
+        try:
+            values.tofile(values_path)
+            index['values_file'] = os.path.basename(values_path)
+            atomic_write(self.index_path, lambda f: json.dump(index, f))
+        except BaseException:
+            os.remove(values_path)
+            raise
+        # Drop our own mapping of the replaced file. Processes that mapped it keep
+        # reading it until they reload, removing the name does not unmap it
+        self._values = None
+        if old_values_path is not None and old_values_path != values_path:
+            try:
+                os.remove(old_values_path)
+            except OSError:
+                # Already removed, or still mapped on a platform that cannot unlink it
+                pass
@@ -1,25 +1,54 @@
 import os
-import glob
 from datetime import datetime
-import pandas as pd
-from .data_processing import download_database, read_stock, read_stocks, read_stocks_years
+from .data_processing import download_database, refresh_database, read_stock, read_stocks, read_stocks_years
+from .storage import DEFAULT_STORAGE_FORMAT, compact_store
+from .manifest import get_manifest
+from .atomic import get_lock
+from .close_matrix import CloseMatrix
+from .feature_store import FeatureStore
+from .cache import ReadCache
+from .panel import align_panel
+from .scan import LazyScan
+
+# Lock file serializing the close matrix and feature store updates of a data folder
+UPDATE_LOCK_FILE = '.update.lock'
 
 class DataDriver:
-    def __init__(self, data_folder):
+    def __init__(self, data_folder, storage_format=DEFAULT_STORAGE_FORMAT, n_workers=None, fetcher=None,
+                 cache_bytes=512 * 1024 * 1024, low_memory=False):
         """
         Initialize the DataDriver with a data folder path.
         
         Args:
             data_folder (str): Path to the folder containing stock data
+            storage_format (str): File format for new downloads ('csv', 'parquet' or 'feather').
+                Existing partitions are read whatever their format
+            n_workers (int, optional): Number of parallel readers for multi-stock reads.
+                If None, uses the number of CPUs
+            fetcher (callable, optional): fetcher(stock, start_date, end_date) -> DataFrame used
+                for downloads. If None, uses vnstock
+            cache_bytes (int, optional): Memory budget of the in-process read cache. If None, disables it
+            low_memory (bool): If True, reads use the low-memory schema (int32 volume, no audit columns)
         """
         self.data_folder = data_folder
+        self.storage_format = storage_format
+        self.n_workers = n_workers
+        self.fetcher = fetcher
+        self.cache = ReadCache(cache_bytes) if cache_bytes is not None else None
+        self.low_memory = low_memory
         # Create data folder if it doesn't exist
         os.makedirs(data_folder, exist_ok=True)
+        self.manifest = get_manifest(data_folder)
         self.metadata = self._scan_metadata()
+        self.close_matrix = CloseMatrix(data_folder)
+        self.feature_store = FeatureStore(data_folder)
+        # Shared by the threads and processes (e.g. Flask workers) updating the derived data
+        self.update_lock = get_lock(os.path.join(data_folder, UPDATE_LOCK_FILE))
     
     def _scan_metadata(self):
         """
-        Scan the data folder to collect metadata about available stocks and date ranges.
+        Collect metadata about available stocks and date ranges from the data manifest.
+        The manifest is built from the data folder the first time it is missing.
         
         Returns:
             dict: Metadata containing stocks, first day, and last day
@@ -31,38 +60,16 @@ class DataDriver:
         }
         
         try:
-            # Get all stock folders
-            stock_folders = [d for d in os.listdir(self.data_folder) 
-                            if os.path.isdir(os.path.join(self.data_folder, d))]
-            
-            if not stock_folders:
-                return metadata
-            
-            metadata['stocks'] = stock_folders
-            
-            # Scan through all data files to find date ranges
-            # for stock in stock_folders:
-            stock = stock_folders[0] # only check one stock for efficiency
-            print("metadata is checking for only one stock: ", stock)
-            stock_path = os.path.join(self.data_folder, stock)
-            year_folders = [d for d in os.listdir(stock_path) 
-                            if os.path.isdir(os.path.join(stock_path, d))]
+            if not self.manifest.exists():
+                has_stock_folders = any(os.path.isdir(os.path.join(self.data_folder, d))
+                                        for d in os.listdir(self.data_folder))
+                if not has_stock_folders:
+                    return metadata
+                print("Building data manifest for ", self.data_folder)
+                self.manifest.rebuild()
             
-            for year in year_folders:
-                year_path = os.path.join(stock_path, year)
-                data_files = glob.glob(os.path.join(year_path, '*.csv'))
-                
-                if not data_files:
-                    continue
-                    
-                # Read the first file to get date range
-                df = pd.read_csv(data_files[0], index_col=0)
-                dates = pd.to_datetime(df.index)
-                
-                if metadata['first_day'] is None or dates.min() < metadata['first_day']:
-                    metadata['first_day'] = dates.min()
-                if metadata['last_day'] is None or dates.max() > metadata['last_day']:
-                    metadata['last_day'] = dates.max()
+            metadata['stocks'] = self.manifest.stocks()
+            metadata['first_day'], metadata['last_day'] = self.manifest.date_range()
         except Exception as e:
             print(f"Warning: Error scanning metadata: {str(e)}")
             # Return empty metadata if there's an error
@@ -80,15 +87,41 @@ class DataDriver:
         
         return self.metadata['stocks']
     
-    def get_date_range(self):
+    def get_date_range(self, stock=None):
         """
         Get the date range of available data.
         
+        Args:
+            stock (str, optional): Stock symbol. If None, gets the range over all stocks
+            
         Returns:
             tuple: (first_day, last_day) as datetime objects
         """
+        if stock is not None:
+            return self.manifest.date_range(stock)
         return self.metadata['first_day'], self.metadata['last_day']
     
+    def data_version(self):
+        """
+        Get a version of the stored data, changed by every partition write.
+        
+        Returns:
+            tuple: (manifest version, last stored day)
+        """
+        manifest = self.manifest.load()
+        return manifest['version'], manifest['last_day']
+
+    def feature_version(self):
+        """
+        Get a version of the feature store, changed once `update_features` has written new days.
+        Results computed from the features (e.g. predictions) should be keyed on it rather
+        than on `data_version`, which moves before the features are updated.
+        
+        Returns:
+            tuple: (checksum of the close prices, last feature date), None if there are no features yet
+        """
+        return self.feature_store.version()
+    
     def get_stock_data(self, stock, year=None, download_if_missing=True):
         """
         Get data for a specific stock. If the data is not available locally and 
@@ -110,18 +143,19 @@ class DataDriver:
                 # Download data for the current year if no year specified
                 if year is None:
                     year = datetime.now().year
-                download_database({stock: [stock]}, year, self.data_folder, force_replace=False)
+                download_database({stock: [stock]}, year, self.data_folder, force_replace=False,
+                                  storage_format=self.storage_format, fetcher=self.fetcher)
             else:
                 raise ValueError(f"Stock {stock} not found in local data folder")
         
         # Read the data
         if year is not None:
-            return read_stock(stock, self.data_folder, year)
+            return self._cached_read(('stock', stock, year), [stock], [year],
+                                     lambda: read_stock(stock, self.data_folder, year, low_memory=self.low_memory))
         else:
             # Get all available years for this stock
-            years = [d for d in os.listdir(stock_path) 
-                    if os.path.isdir(os.path.join(stock_path, d))]
-            return read_stocks_years([stock], self.data_folder, years=[int(y) for y in years])
+            years = [int(y) for y in sorted(self.manifest.partitions(stock))]
+            return self.read_stocks_years([stock], years)
     
     def get_multiple_stocks_data(self, stocks, year=None, download_if_missing=True):
         """
@@ -142,23 +176,204 @@ class DataDriver:
             if missing_stocks:
                 if year is None:
                     year = datetime.now().year
-                download_database({s: [s] for s in missing_stocks}, year, force_replace=False)
+                download_database({s: [s] for s in missing_stocks}, year, self.data_folder, force_replace=False,
+                                  storage_format=self.storage_format, fetcher=self.fetcher)
                 # Update metadata after downloading
                 self.metadata = self._scan_metadata()
         
         # Read the data
         if year is not None:
-            return read_stocks(stocks, year, self.data_folder)
+            return self._cached_read(('stocks', tuple(stocks), year), stocks, [year],
+                                     lambda: read_stocks(stocks, year, self.data_folder, low_memory=self.low_memory))
         else:
             # Get all available years
             years = range(
                 self.metadata['first_day'].year,
                 self.metadata['last_day'].year + 1
             )
-            return read_stocks_years(stocks, self.data_folder, years=years)
+            return self.read_stocks_years(stocks, years)
+        
+    def read_stocks_years(self, stocks, years, columns=None):
+        """
+        Read data of multiple stocks across multiple years, served from the read
+        cache when the stored partitions have not changed since the last read.
+        
+        Args:
+            stocks (list): List of stock symbols
+            years (list): Years to read
+            columns (list, optional): Columns to read. If None, reads all columns
+            
+        Returns:
+            pd.DataFrame: Combined stock data. Treat it as read-only, it may be shared with the cache
+        """
+        years = [int(y) for y in years]
+        key = ('stocks_years', tuple(stocks), tuple(years), tuple(columns) if columns else None)
+        return self._cached_read(key, stocks, years,
+                                 lambda: read_stocks_years(stocks, self.data_folder, years=years,
+                                                           n_workers=self.n_workers, columns=columns,
+                                                           low_memory=self.low_memory))
+
+    def get_panel(self, stocks, years, columns=None, fill='ffill', limit=None):
+        """
+        Get stock data aligned on the HOSE/HNX trading calendar, with missing days filled.
         
-    def read_stocks_years(self, stocks, years):
-        return read_stocks_years(stocks, self.data_folder, years=years)
+        Args:
+            stocks (list): List of stock symbols
+            years (list): Years to read
+            columns (list, optional): Columns to read. If None, reads all columns
+            fill (str, optional): 'ffill' carries prices forward over days a stock did not trade,
+                None leaves them as NaN
+            limit (int, optional): Maximum number of consecutive days to forward fill
+            
+        Returns:
+            tuple: (panel, mask), panel has (column, stock) columns and mask is a
+                days x stocks boolean DataFrame, True on the days a stock traded
+        """
+        data = self.read_stocks_years(stocks, years, columns=columns)
+        return align_panel(data, fill=fill, limit=limit, low_memory=self.low_memory)
+
+    def _data_version(self, stocks, years):
+        """
+        Get the manifest versions of the partitions behind a read.
+        """
+        versions = []
+        for stock in stocks:
+            partitions = self.manifest.partitions(stock)
+            versions.extend(partitions.get(str(y), {}).get('version') for y in years)
+        return tuple(versions)
+
+    def _cached_read(self, key, stocks, years, read):
+        if self.cache is None:
+            return read()
+        version = self._data_version(stocks, years)
+        data = self.cache.get(key, version)
+        if data is None:
+            data = read()
+            self.cache.put(key, version, data)
+        return data
+
+    def cache_stats(self):
+        """
+        Get hit/miss statistics of the read cache.
+        
+        Returns:
+            dict: Cache statistics, empty if the cache is disabled
+        """
+        return self.cache.stats() if self.cache is not None else {}
+
+    def get_close_prices(self, stocks=None, start=None, end=None, last=None):
+        """
+        Get close prices from the memory-mapped close matrix, building it for
+        stocks that are not in it yet.
+        
+        Args:
+            stocks (list, optional): Stock symbols. If None, uses all available stocks
+            start (str, optional): First date to include
+            end (str, optional): Last date to include
+            last (int, optional): Only keep the last `last` days of the range
+            
+        Returns:
+            pd.DataFrame: Close prices indexed by date, one column per stock
+        """
+        if stocks is None:
+            stocks = self.get_available_stocks()
+        missing_stocks = [s for s in stocks if s not in self.close_matrix.stocks]
+        if missing_stocks:
+            self.update_close_matrix(missing_stocks)
+        return self.close_matrix.get(stocks, start=start, end=end, last=last)
+
+    def update_close_matrix(self, stocks, years=None):
+        """
+        Load close prices of stocks from the stored partitions into the close matrix,
+        then update the features. Concurrent updates of the data folder run one at a time.
+        
+        Args:
+            stocks (list): List of stock symbols
+            years (list, optional): Years to load. If None, loads every stored year
+        """
+        start, end = None, None
+        if years is not None:
+            start, end = f"{min(years)}-01-01", f"{max(years)}-12-31"
+        with self.update_lock:
+            data = self.scan(stocks, start=start, end=end, columns=['Close']).collect()
+            if not data.empty:
+                self.close_matrix.update(data['Close'])
+                self.update_features()
+
+    def update_features(self):
+        """
+        Bring the feature store up to date with the close matrix, computing only the new days.
+        
+        Returns:
+            int: Number of days computed
+        """
+        with self.update_lock:
+            if not self.close_matrix.exists():
+                return 0
+            n_days = self.feature_store.update(self.close_matrix.get())
+        if n_days:
+            print(f"FEATURES UPDATED: {n_days} days")
+        return n_days
+
+    def warm_up(self, stocks=None):
+        """
+        Load the missing stocks into the close matrix and bring the features up to date,
+        once and synchronously, e.g. when the app starts, before background work reads them.
+        
+        Args:
+            stocks (list, optional): Stock symbols. If None, uses all available stocks
+        """
+        if stocks is None:
+            stocks = self.get_available_stocks()
+        with self.update_lock:
+            missing_stocks = [s for s in stocks if s not in self.close_matrix.stocks]
+            if missing_stocks:
+                self.update_close_matrix(missing_stocks)
+            else:
+                self.update_features()
+
+    def get_features(self, name, stocks=None, start=None, end=None, last=None):
+        """
+        Get a feature from the feature store: 'returns' (cleaned daily returns),
+        'adjusted' (cumulative adjusted prices) or 'targets' (forward returns).
+        
+        Args:
+            name (str): Feature name
+            stocks (list, optional): Stock symbols. If None, uses all available stocks
+            start (str, optional): First date to include
+            end (str, optional): Last date to include
+            last (int, optional): Only keep the last `last` days of the range
+            
+        Returns:
+            pd.DataFrame: Feature values indexed by date, one column per stock
+        """
+        if stocks is None:
+            stocks = self.get_available_stocks()
+        missing_stocks = [s for s in stocks if s not in self.close_matrix.stocks]
+        if missing_stocks:
+            self.update_close_matrix(missing_stocks)
+        elif not self.feature_store.exists():
+            self.update_features()
+        return self.feature_store.get(name, stocks, start=start, end=end, last=last)
+
+    def scan(self, stocks=None, start=None, end=None, columns=None):
+        """
+        Build a lazy query over the stored data. Partitions outside [start, end]
+        are skipped and only `columns` are read from the files.
+        
+        Args:
+            stocks (list, optional): Stock symbols. If None, uses all available stocks
+            start (str, optional): First date to read
+            end (str, optional): Last date to read
+            columns (list, optional): Columns to read. If None, reads all columns
+            
+        Returns:
+            LazyScan: Query to run with `collect()` or `to_numpy()`
+        """
+        if stocks is None:
+            stocks = self.get_available_stocks()
+        return LazyScan(self.data_folder, self.manifest, stocks, start=start, end=end, columns=columns,
+                        n_workers=self.n_workers, low_memory=self.low_memory)
 
     def download_database(self, stocks, year=None, force_replace=False):
         """
@@ -168,12 +383,56 @@ class DataDriver:
             stocks (list): List of stock symbols to download
             year (int, optional): Year to download data for. If None, uses current year
             force_replace (bool): Whether to replace existing data
+            
+        Returns:
+            dict: Stock symbol -> DownloadResult with the status of each download
         """
         if year is None:
             year = datetime.now().year
             
         # Download data for each stock
-        download_database(stocks, year, self.data_folder, force_replace)
+        results = download_database(stocks, year, self.data_folder, force_replace,
+                                    storage_format=self.storage_format, fetcher=self.fetcher)
+        
+        # Update metadata and close matrix after downloading
+        self.metadata = self._scan_metadata()
+        self.update_close_matrix(stocks, years=[year])
+        return results
+
+    def refresh_database(self, stocks=None, end_date=None):
+        """
+        Incrementally refresh data: download only the days after the last stored
+        date of each stock and merge them into the existing partitions.
+        
+        Args:
+            stocks (list, optional): List of stock symbols. If None, refreshes all available stocks
+            end_date (str, optional): Last date to download. If None, uses today
+            
+        Returns:
+            dict: Stock symbol -> DownloadResult with the status of each download
+        """
+        if stocks is None:
+            stocks = self.get_available_stocks()
+        results, updated_years = refresh_database(stocks, self.data_folder, end_date=end_date,
+                                                  storage_format=self.storage_format, fetcher=self.fetcher)
+        
+        # Update metadata and close matrix with the appended days
+        self.metadata = self._scan_metadata()
+        if updated_years:
+            years = sorted({y for stock_years in updated_years.values() for y in stock_years})
+            self.update_close_matrix(list(updated_years), years=years)
+        return results
+
+    def compact(self, keep=0):
+        """
+        Merge the snapshots of every partition into a single current file.
         
-        # Update metadata after downloading
-        self.metadata = self._scan_metadata() 
\ No newline at end of file
+        Args:
+            keep (int): Number of previous snapshots to retain per partition
+            
+        Returns:
+            int: Number of compacted partitions
+        """
+        n_compacted = compact_store(self.data_folder, keep=keep, storage_format=self.storage_format)
+        self.metadata = self._scan_metadata()
+        return n_compacted
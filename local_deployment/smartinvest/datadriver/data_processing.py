@@ -1,10 +1,14 @@
 import os
-import glob
-import time
 import shutil
 import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import pandas as pd
 import vnstock
+from .storage import DEFAULT_STORAGE_FORMAT, write_partition, read_partition, find_partition_file, resolve_partition_file
+from .downloader import DownloadEngine, _print_progress
+from .manifest import get_manifest
+from .panel import build_panel
+from .schema import apply_panel_schema
 
 def _check_existing_data(stock, data_folder, year=None, force_replace=False):
     """
@@ -63,7 +67,7 @@ def _download_from_vnstock(stock, start_date, end_date):
     data["logtime"] = datetime.datetime.now().strftime("%Y%m%dT%I:%M%p")
     return data
 
-def _save_data_by_year(data, stock, data_folder,force_replace=False):
+def _save_data_by_year(data, stock, data_folder,force_replace=False, storage_format=DEFAULT_STORAGE_FORMAT):
     """
     Save data to appropriate year folders.
     
@@ -71,6 +75,7 @@ def _save_data_by_year(data, stock, data_folder,force_replace=False):
         data (pd.DataFrame): Stock data to save
         stock (str): Stock symbol
         force_replace (bool): Whether to replace existing data
+        storage_format (str): File format of the saved partitions
     """
     data.index = pd.to_datetime(data.index)
     years = data.index.year.unique()
@@ -81,10 +86,11 @@ def _save_data_by_year(data, stock, data_folder,force_replace=False):
             path, should_save = _check_existing_data(stock, data_folder, year, force_replace)
             if should_save:
                 download_time = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-                year_data.to_csv(os.path.join(path, f"{download_time}.csv"))
+                write_partition(year_data, path, download_time, storage_format)
                 print(f"{'RENEW' if force_replace else 'NEW'} DATA SAVED TO DATABASE: {stock}, {year}")
 
-def download_stock_data(stock, year, data_folder, path=None, force_replace=False, download_time=None, time_from=None, time_to=None):
+def download_stock_data(stock, year, data_folder, path=None, force_replace=False, download_time=None, time_from=None, time_to=None,
+                        storage_format=DEFAULT_STORAGE_FORMAT):
     """
     Download historical stock data and save it to the specified path.
     
@@ -96,6 +102,7 @@ def download_stock_data(stock, year, data_folder, path=None, force_replace=False
         download_time (str, optional): Timestamp for filename
         time_from (str, optional): Start date in format 'YYYY-MM-DD'
         time_to (str, optional): End date in format 'YYYY-MM-DD'
+        storage_format (str): File format of the saved partition
     """
     if path is None:
         path = os.path.join(data_folder, stock, str(year))
@@ -113,10 +120,11 @@ def download_stock_data(stock, year, data_folder, path=None, force_replace=False
     
     data = _download_from_vnstock(stock, time_from, time_to)
     if data is not None:
-        data.to_csv(os.path.join(path, f"{download_time}.csv"))
+        write_partition(data, path, download_time, storage_format)
         print(f"{'RENEW' if force_replace else 'NEW'} DATA SAVED TO DATABASE: {stock}")
 
-def download_stock_data_by_date_range(stock, from_date, to_date, data_folder, force_replace=False):
+def download_stock_data_by_date_range(stock, from_date, to_date, data_folder, force_replace=False,
+                                      storage_format=DEFAULT_STORAGE_FORMAT):
     """
     Download historical stock data for a specific date range and save it to the appropriate year folders.
     
@@ -125,6 +133,7 @@ def download_stock_data_by_date_range(stock, from_date, to_date, data_folder, fo
         from_date (str): Start date in format 'YYYY-MM-DD'
         to_date (str): End date in format 'YYYY-MM-DD'
         force_replace (bool): If True, replace existing data
+        storage_format (str): File format of the saved partitions
     """
     from_date_dt = pd.to_datetime(from_date)
     to_date_dt = pd.to_datetime(to_date)
@@ -133,7 +142,7 @@ def download_stock_data_by_date_range(stock, from_date, to_date, data_folder, fo
     # Check if we should proceed with download
     should_proceed = False
     for year in years:
-        _, proceed = _check_existing_data(stock, year, force_replace)
+        _, proceed = _check_existing_data(stock, data_folder, year, force_replace)
         if proceed:
             should_proceed = True
             break
@@ -143,9 +152,10 @@ def download_stock_data_by_date_range(stock, from_date, to_date, data_folder, fo
     
     data = _download_from_vnstock(stock, from_date, to_date)
     if data is not None:
-        _save_data_by_year(data, stock, data_folder, force_replace)
+        _save_data_by_year(data, stock, data_folder, force_replace, storage_format)
 
-def download_database(stock_list, year, data_folder, force_replace=False):
+def download_database(stock_list, year, data_folder, force_replace=False, storage_format=DEFAULT_STORAGE_FORMAT,
+                      fetcher=None, n_workers=4, rate=10.0, progress=_print_progress):
     """
     Download and update stock data into the database.
     
@@ -153,17 +163,41 @@ def download_database(stock_list, year, data_folder, force_replace=False):
         stock_list (dict): Dictionary of stock groups and their respective stock symbols
         year (int): Year for which data is to be downloaded
         force_replace (bool): If True, replace existing data
+        storage_format (str): File format of the saved partitions
+        fetcher (callable, optional): fetcher(stock, start_date, end_date) -> DataFrame. If None, uses vnstock
+        n_workers (int): Number of concurrent downloads
+        rate (float): Maximum requests per second
+        progress (callable, optional): Called with a DownloadResult after each stock
+
+    Returns:
+        dict: Stock symbol -> DownloadResult for the downloaded stocks
     """
     year = str(year)
     time_from, time_to = f"{year}-01-01", f"{year}-12-31"
     download_time = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-    
+
+    def save(stock, data):
+        # Existing data is only removed once its replacement has been downloaded
+        path, should_save = _check_existing_data(stock, data_folder, year, force_replace)
+        if should_save:
+            write_partition(data, path, download_time, storage_format)
+            print(f"{'RENEW' if force_replace else 'NEW'} DATA SAVED TO DATABASE: {stock}")
+
+    jobs = []
     for stock in stock_list:
-        download_stock_data(stock, year, data_folder,force_replace=force_replace, 
-                          download_time=download_time, time_from=time_from, time_to=time_to)
-        time.sleep(0.1)  # Prevent API rate limit issues
+        if not force_replace and os.path.exists(os.path.join(data_folder, stock, year)):
+            print(f"DATA ALREADY EXISTS: {stock}, {year}")
+            continue
+        jobs.append((stock, time_from, time_to))
+
+    engine = DownloadEngine(fetcher, n_workers=n_workers, rate=rate, progress=progress)
+    # The partitions saved by the workers are recorded with one manifest write
+    with get_manifest(data_folder).batch():
+        return engine.run(jobs, on_data=save)
 
-def download_database_by_date_range(stock_list, from_date, to_date, force_replace=False):
+def download_database_by_date_range(stock_list, from_date, to_date, data_folder, force_replace=False,
+                                    storage_format=DEFAULT_STORAGE_FORMAT, fetcher=None, n_workers=4,
+                                    rate=10.0, progress=_print_progress):
     """
     Download and update stock data into the database for a specific date range.
     
@@ -172,34 +206,147 @@ def download_database_by_date_range(stock_list, from_date, to_date, force_replac
         from_date (str): Start date in format 'YYYY-MM-DD'
         to_date (str): End date in format 'YYYY-MM-DD'
         force_replace (bool): If True, replace existing data
+        storage_format (str): File format of the saved partitions
+        fetcher (callable, optional): fetcher(stock, start_date, end_date) -> DataFrame. If None, uses vnstock
+        n_workers (int): Number of concurrent downloads
+        rate (float): Maximum requests per second
+        progress (callable, optional): Called with a DownloadResult after each stock
+
+    Returns:
+        dict: Stock symbol -> DownloadResult for the downloaded stocks
+    """
+    years = range(pd.to_datetime(from_date).year, pd.to_datetime(to_date).year + 1)
+
+    def save(stock, data):
+        _save_data_by_year(data, stock, data_folder, force_replace, storage_format)
+
+    jobs = []
+    for stock in stock_list:
+        missing_years = [y for y in years if not os.path.exists(os.path.join(data_folder, stock, str(y)))]
+        if not force_replace and not missing_years:
+            print(f"DATA ALREADY EXISTS: {stock}")
+            continue
+        jobs.append((stock, from_date, to_date))
+
+    engine = DownloadEngine(fetcher, n_workers=n_workers, rate=rate, progress=progress)
+    # The partitions saved by the workers are recorded with one manifest write
+    with get_manifest(data_folder).batch():
+        return engine.run(jobs, on_data=save)
+
+def _last_stored_date(stock, data_folder):
+    """
+    Get the last date stored for a stock, or None if the stock has no data.
+    """
+    manifest = get_manifest(data_folder)
+    if not manifest.exists():
+        manifest.rebuild()
+    return manifest.date_range(stock)[1]
+
+def _merge_into_partitions(data, stock, data_folder, storage_format=DEFAULT_STORAGE_FORMAT):
+    """
+    Append new rows to the year partitions of a stock, replacing rows with the same date.
+    
+    Args:
+        data (pd.DataFrame): New stock data indexed by date
+        stock (str): Stock symbol
+        storage_format (str): File format of the rewritten partitions
+
+    Returns:
+        list: Years whose partition was rewritten
     """
+    data = data.copy()
+    data.index = pd.to_datetime(data.index)
+    download_time = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    years = []
+
+    for year in data.index.year.unique():
+        year_data = data[data.index.year == year]
+        path = os.path.join(data_folder, stock, str(year))
+        old_files = []
+        if os.path.isdir(path):
+            try:
+                old_file = find_partition_file(path)
+                old_files = [os.path.join(path, f) for f in os.listdir(path)]
+                existing = read_partition(old_file)
+                existing.index = pd.to_datetime(existing.index)
+                year_data = pd.concat([existing, year_data])
+                year_data = year_data[~year_data.index.duplicated(keep='last')].sort_index()
+            except FileNotFoundError:
+                pass
+
+        new_file = write_partition(year_data, path, download_time, storage_format)
+        # Remove the previous snapshot only after the merged one is written
+        for f in old_files:
+            if f != new_file and os.path.isfile(f):
+                os.remove(f)
+        years.append(int(year))
+        print(f"DATA APPENDED TO DATABASE: {stock}, {year}")
+    return years
+
+def refresh_database(stock_list, data_folder, end_date=None, storage_format=DEFAULT_STORAGE_FORMAT,
+                     fetcher=None, n_workers=4, rate=10.0, progress=_print_progress):
+    """
+    Incrementally refresh stock data: only the days after the last stored date
+    of each stock are downloaded and merged into its partitions.
+    
+    Args:
+        stock_list (list): List of stock symbols
+        end_date (str, optional): Last date to download in format 'YYYY-MM-DD'. If None, uses today
+        storage_format (str): File format of the rewritten partitions
+        fetcher (callable, optional): fetcher(stock, start_date, end_date) -> DataFrame. If None, uses vnstock
+        n_workers (int): Number of concurrent downloads
+        rate (float): Maximum requests per second
+        progress (callable, optional): Called with a DownloadResult after each stock
+
+    Returns:
+        tuple: (dict of stock symbol -> DownloadResult, dict of stock symbol -> rewritten years)
+    """
+    end = pd.Timestamp(end_date) if end_date is not None else pd.Timestamp.now().normalize()
+
+    jobs = []
     for stock in stock_list:
-        download_stock_data_by_date_range(stock, from_date, to_date, force_replace)
-        time.sleep(0.1)  # Prevent API rate limit issues
+        last_date = _last_stored_date(stock, data_folder)
+        start = last_date + pd.Timedelta(days=1) if last_date is not None else pd.Timestamp(year=end.year, month=1, day=1)
+        if start > end:
+            print(f"DATA UP TO DATE: {stock}")
+            continue
+        jobs.append((stock, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')))
+
+    updated_years = {}
+    def save(stock, data):
+        updated_years[stock] = _merge_into_partitions(data, stock, data_folder, storage_format)
 
-def read_stock(stock, data_folder, year=None):
+    engine = DownloadEngine(fetcher, n_workers=n_workers, rate=rate, progress=progress)
+    # The partitions saved by the workers are recorded with one manifest write
+    with get_manifest(data_folder).batch():
+        results = engine.run(jobs, on_data=save)
+    return results, updated_years
+
+def read_stock(stock, data_folder, year=None, columns=None, low_memory=False):
     """
     Read data of a specific stock.
 
     Args:
         stock (str): Stock symbol
         year (int): Year of the data to read
+        columns (list, optional): Columns to read. If None, reads all columns
+        low_memory (bool): If True, uses the low-memory schema (int32 volume, no audit columns)
 
     Returns:
         pd.DataFrame: Stock data
     """
-    path = os.path.join(data_folder, stock, str(year))
-    file_path = glob.glob(os.path.join(path, '*'))[0]
-    data = pd.read_csv(file_path, header=[0], index_col=0)
+    file_path = resolve_partition_file(data_folder, stock, year)
+    data = read_partition(file_path, columns=columns, low_memory=low_memory)
     return data
 
-def read_stocks(stocks, year, data_folder):
+def read_stocks(stocks, year, data_folder, low_memory=False):
     """
     Read data of multiple stocks.
 
     Args:
         stocks (list): List of stock symbols
         year (int): Year of the data to read
+        low_memory (bool): If True, uses the low-memory schema (int32 volume, no audit columns)
 
     Returns:
         pd.DataFrame: Combined stock data
@@ -209,29 +356,62 @@ def read_stocks(stocks, year, data_folder):
     
     data = []
     for stock in stocks:
-        data_i = read_stock(stock, data_folder, year)
+        data_i = read_stock(stock, data_folder, year, low_memory=low_memory)
         data_i.columns = pd.MultiIndex.from_tuples( [(i, stock) for i in data_i.columns] )
         data.append( data_i )
     # TODO: sửa lại thêm 2 line: stock_id và tên value vì luồng format mới không có tên stock trong raw data
-    return pd.concat(data, axis=1)
+    return apply_panel_schema(pd.concat(data, axis=1), low_memory=low_memory)
+
+def _read_stock_task(task):
+    stock, data_folder, year, columns, low_memory = task
+    return read_stock(stock, data_folder, year, columns=columns, low_memory=low_memory)
 
-def read_stocks_years(stocks, data_folder, years=None, year_from=None, year_to=None):
+def read_stocks_years(stocks, data_folder, years=None, year_from=None, year_to=None,
+                      n_workers=None, executor='thread', columns=None, low_memory=False):
     """
     Read data of multiple stocks across multiple years.
 
+    All (stock, year) partitions are read in parallel and combined with a single
+    concat at the end.
+
     Args:
         stocks (list): List of stock symbols
         years (list, optional): Specific years to read data for
         year_from (int, optional): Start year (inclusive) if `years` is not provided
         year_to (int, optional): End year (inclusive) if `years` is not provided
+        n_workers (int, optional): Number of parallel readers. If None, uses the number of CPUs.
+            1 reads serially
+        executor (str): 'thread' or 'process'. Threads suit parquet/feather whose
+            readers release the GIL, processes suit large csv trees
+        columns (list, optional): Columns to read. If None, reads all columns
+        low_memory (bool): If True, uses the low-memory schema (int32 volume, no audit columns)
 
     Returns:
-        pd.DataFrame: Combined stock data across the specified years
+        pd.DataFrame: Combined stock data across the specified years, indexed by date
     """
     if years is None:
         if year_from is None or year_to is None:
             raise ValueError("Either 'years' or both 'year_from' and 'year_to' must be provided.")
         years = range(year_from, year_to + 1)
-    
-    data_frames = [read_stocks(stocks, year, data_folder) for year in years]
-    return pd.concat(data_frames, axis=0, ignore_index=True)
\ No newline at end of file
+    years = list(years)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+
+    tasks = [(stock, data_folder, year, columns, low_memory) for stock in stocks for year in years]
+    if n_workers <= 1 or len(tasks) <= 1:
+        partitions = list(map(_read_stock_task, tasks))
+    else:
+        if executor == 'process':
+            pool = ProcessPoolExecutor(max_workers=n_workers)
+        elif executor == 'thread':
+            pool = ThreadPoolExecutor(max_workers=n_workers)
+        else:
+            raise ValueError(f"Unknown executor '{executor}', expected 'thread' or 'process'")
+        with pool:
+            partitions = list(pool.map(_read_stock_task, tasks))
+
+    # Stack years per stock, then pivot all stocks onto one date index
+    frames = {stock: pd.concat(partitions[i*len(years):(i+1)*len(years)], axis=0)
+              for i, stock in enumerate(stocks)}
+    data, _ = build_panel(frames, fill=None, low_memory=low_memory)
+    return data
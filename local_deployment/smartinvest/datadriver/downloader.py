@@ -0,0 +1,144 @@
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+
+DownloadResult = namedtuple('DownloadResult', ['stock', 'status', 'rows', 'attempts', 'elapsed', 'error'])
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting how many requests are sent per second.
+    """
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Tokens added per second, i.e. the sustained request rate
+            capacity (int, optional): Maximum burst size. If None, equals `rate`
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available, then take it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class VnstockFetcher:
+    """
+    Fetch daily prices from the vnstock API.
+    """
+    def __call__(self, stock, start_date, end_date):
+        # Imported here to avoid a circular import with data_processing
+        from .data_processing import _download_from_vnstock
+        return _download_from_vnstock(stock, start_date, end_date)
+
+class FrameFetcher:
+    """
+    Serve prices from in-memory DataFrames, to replace vnstock in tests and benchmarks.
+    """
+    def __init__(self, frames, latency=0.0):
+        """
+        Args:
+            frames (dict): Stock symbol -> DataFrame indexed by date
+            latency (float): Seconds to sleep per call, to mimic a remote API
+        """
+        self.frames = frames
+        self.latency = latency
+
+    def __call__(self, stock, start_date, end_date):
+        if self.latency:
+            time.sleep(self.latency)
+        data = self.frames.get(stock)
+        if data is None:
+            return None
+        dates = pd.to_datetime(data.index)
+        data = data[(dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))]
+        return None if data.empty else data.copy()
+
+def _print_progress(result):
+    if result.status == 'failed':
+        print(f"DOWNLOAD FAILED: {result.stock} after {result.attempts} attempts: {result.error}")
+    else:
+        print(f"DOWNLOAD {result.status.upper()}: {result.stock}, {result.rows} rows, {result.elapsed:.2f}s")
+
+class DownloadEngine:
+    """
+    Download many stocks concurrently with rate limiting and retries.
+    """
+    def __init__(self, fetcher=None, n_workers=4, rate=10.0, max_retries=3, backoff=0.5, progress=_print_progress):
+        """
+        Args:
+            fetcher (callable, optional): fetcher(stock, start_date, end_date) -> DataFrame or None.
+                If None, uses VnstockFetcher
+            n_workers (int): Number of concurrent downloads
+            rate (float): Maximum requests per second across all workers
+            max_retries (int): Retries of a failed request before giving up on a stock
+            backoff (float): Base delay in seconds, doubled after each failed attempt
+            progress (callable, optional): Called with a DownloadResult after each stock
+        """
+        self.fetcher = fetcher if fetcher is not None else VnstockFetcher()
+        self.n_workers = n_workers
+        self.rate_limiter = TokenBucket(rate, capacity=max(n_workers, 1))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.progress = progress
+
+    def _download_one(self, stock, start_date, end_date, on_data):
+        start = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            self.rate_limiter.acquire()
+            try:
+                data = self.fetcher(stock, start_date, end_date)
+                break
+            except Exception as e:
+                if attempts > self.max_retries:
+                    return DownloadResult(stock, 'failed', 0, attempts, time.monotonic() - start, str(e))
+                time.sleep(self.backoff * 2 ** (attempts - 1))
+
+        if data is None or data.empty:
+            return DownloadResult(stock, 'empty', 0, attempts, time.monotonic() - start, None)
+        if on_data is not None:
+            try:
+                on_data(stock, data)
+            except Exception as e:
+                return DownloadResult(stock, 'failed', 0, attempts, time.monotonic() - start, str(e))
+        return DownloadResult(stock, 'ok', len(data), attempts, time.monotonic() - start, None)
+
+    def run(self, jobs, on_data=None):
+        """
+        Download all jobs.
+
+        Args:
+            jobs (list): (stock, start_date, end_date) tuples
+            on_data (callable, optional): on_data(stock, data) called from the worker
+                with each downloaded DataFrame, e.g. to save it
+
+        Returns:
+            dict: Stock symbol -> DownloadResult
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(self.n_workers, 1)) as pool:
+            futures = [pool.submit(self._download_one, stock, start_date, end_date, on_data)
+                       for stock, start_date, end_date in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.stock] = result
+                if self.progress is not None:
+                    self.progress(result)
+        return results
@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+from .atomic import atomic_write, get_lock
+from .close_matrix import CloseMatrix
+from ..processing.feature_engineering import clean_returns, adjusted_prices, forward_returns
+
+FEATURES_FOLDER = 'features'
+FEATURE_NAMES = ['returns', 'adjusted', 'targets']
+DEFAULT_HORIZON = 30
+
+class FeatureStore:
+    """
+    Days x tickers feature matrices computed once from the close matrix and kept
+    under data/features/ in the close matrix format (memory-mapped float32):
+
+        returns    cleaned daily returns of the forward-filled close prices
+        adjusted   cumulative adjusted price index, NaN before a stock is listed
+        targets    return of the adjusted price `horizon` days later
+
+    When new days are added to the close matrix only the tail is computed: the
+    returns and adjusted prices of the new days and the targets of the last
+    `horizon` stored days, which were unknown until now.
+    """
+    STATE_FILE = 'state.json'
+    LOCK_FILE = '.lock'
+
+    @staticmethod
+    def _checksum(close):
+        values = np.ascontiguousarray(close.to_numpy(dtype=np.float32))
+        return hashlib.sha1(values.tobytes()).hexdigest()
+
+    def __init__(self, data_folder, horizon=DEFAULT_HORIZON):
+        """
+        Args:
+            data_folder (str): Path to the folder containing stock data
+            horizon (int): Number of days ahead the targets are measured
+        """
+        self.folder = os.path.join(data_folder, FEATURES_FOLDER)
+        self.horizon = horizon
+        self.matrices = {name: CloseMatrix(self.folder, name) for name in FEATURE_NAMES}
+        self.state_path = os.path.join(self.folder, self.STATE_FILE)
+        # Held over a whole update, so concurrent updates never interleave the matrices and the state
+        self.lock = get_lock(os.path.join(self.folder, self.LOCK_FILE))
+
+    def exists(self):
+        return os.path.exists(self.state_path) and all(m.exists() for m in self.matrices.values())
+
+    def _state(self):
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def get(self, name, stocks=None, start=None, end=None, last=None):
+        """
+        Get one feature as a DataFrame backed by its memory-mapped matrix.
+
+        Args:
+            name (str): One of 'returns', 'adjusted', 'targets'
+            stocks (list, optional): Stock symbols. If None, all stocks
+            start (str, optional): First date to include
+            end (str, optional): Last date to include
+            last (int, optional): Only keep the last `last` days of the range
+
+        Returns:
+            pd.DataFrame: Feature values, shape n_days x n_stocks
+        """
+        if name not in self.matrices:
+            raise ValueError(f"Unknown feature '{name}', expected one of {FEATURE_NAMES}")
+        return self.matrices[name].get(stocks, start=start, end=end, last=last)
+
+    def get_targets(self, horizon, stocks=None, start=None, end=None):
+        """
+        Get the forward returns over any horizon. Other horizons than the stored
+        one are computed from the stored adjusted prices.
+
+        Returns:
+            pd.DataFrame: Targets, shape n_days x n_stocks, NaN where the day `horizon` days later is after `end`
+        """
+        if horizon == self.horizon:
+            return self.get('targets', stocks, start=start, end=end)
+        adjusted = self.get('adjusted', stocks, start=start, end=end)
+        return pd.DataFrame(forward_returns(adjusted, horizon), index=adjusted.index, columns=adjusted.columns)
+
+    def last_date(self):
+        if not self.exists():
+            return None
+        return self._state()['last_date']
+
+    def version(self):
+        """
+        Get a version of the stored features, changed by every update that computes days.
+        The state file is replaced last, so the version only moves once the features are written.
+
+        Returns:
+            tuple: (checksum of the close prices, last date), None if the store does not exist
+        """
+        if not self.exists():
+            return None
+        state = self._state()
+        return state['checksum'], state['last_date']
+
+    def update(self, close):
+        """
+        Bring the features up to date with the close matrix.
+
+        Args:
+            close (pd.DataFrame): Every stored close price, indexed by date, one column per stock
+
+        Returns:
+            int: Number of days computed, 0 if the features were up to date
+        """
+        with self.lock:
+            return self._update(close)
+
+    def _update(self, close):
+        dates = pd.to_datetime(close.index).strftime('%Y-%m-%d').tolist()
+        stocks = [str(s) for s in close.columns]
+        state = self._state() if self.exists() else None
+
+        if state is not None and state['stocks'] == stocks and state['horizon'] == self.horizon:
+            n_old = state['n_days']
+            # The stored days must be unchanged: no year downloaded before them, no price revised
+            if (self.horizon < n_old <= len(dates) and state['dates'] == [dates[0], dates[n_old-1]]
+                    and state['checksum'] == self._checksum(close.iloc[:n_old])):
+                if n_old == len(dates):
+                    return 0
+                self._update_tail(close, n_old, np.array(state['last_close'], dtype=np.float32))
+                return len(dates) - n_old
+        self._rebuild(close)
+        return len(dates)
+
+    def _rebuild(self, close):
+        prices = close.ffill().to_numpy(dtype=np.float32)
+        returns = clean_returns(prices)
+        adjusted = adjusted_prices(returns)
+        adjusted[np.isnan(prices)] = np.nan
+        targets = forward_returns(adjusted, self.horizon)
+        self._write(close, {'returns': returns, 'adjusted': adjusted, 'targets': targets}, prices[-1])
+
+    def _update_tail(self, close, n_old, last_close):
+        # The last stored price starts the forward fill and the first return of the new days
+        prices = np.vstack([last_close[None], close.iloc[n_old:].to_numpy(dtype=np.float32)])
+        prices = pd.DataFrame(prices).ffill().to_numpy(dtype=np.float32)
+        new_returns = clean_returns(prices)[1:]
+
+        old = {name: np.asarray(self.get(name)) for name in FEATURE_NAMES}
+        # Stocks listed after the last stored day start their index at 1, like in `adjusted_prices`
+        base = np.nan_to_num(old['adjusted'][-1], nan=1.0)
+        new_adjusted = base * adjusted_prices(new_returns)
+        new_adjusted[np.isnan(prices[1:])] = np.nan
+
+        adjusted = np.concatenate([old['adjusted'], new_adjusted])
+        tail_targets = forward_returns(adjusted[n_old-self.horizon:], self.horizon)
+        self._write(close, {
+            'returns': np.concatenate([old['returns'], new_returns]),
+            'adjusted': adjusted,
+            'targets': np.concatenate([old['targets'][:n_old-self.horizon], tail_targets]),
+        }, prices[-1])
+
+    def _write(self, close, features, last_close):
+        os.makedirs(self.folder, exist_ok=True)
+        for name, values in features.items():
+            self.matrices[name].write(pd.DataFrame(values, index=close.index, columns=close.columns))
+        state = {
+            'stocks': [str(s) for s in close.columns],
+            'horizon': self.horizon,
+            'n_days': len(close),
+            'dates': [pd.Timestamp(d).strftime('%Y-%m-%d') for d in (close.index[0], close.index[-1])],
+            'last_date': pd.Timestamp(close.index[-1]).strftime('%Y-%m-%d'),
+            'checksum': self._checksum(close),
+            'last_close': [None if np.isnan(v) else float(v) for v in last_close],
+        }
+        atomic_write(self.state_path, lambda f: json.dump(state, f))
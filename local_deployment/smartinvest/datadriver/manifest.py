@@ -0,0 +1,243 @@
+import os
+import json
+import glob
+import hashlib
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from .atomic import atomic_write, get_lock
+
+MANIFEST_FILE = 'manifest.json'
+# Lock file serializing manifest writes across threads and processes
+MANIFEST_LOCK_FILE = '.manifest.lock'
+
+# Guards the shared Manifest instances
+_locks_guard = threading.Lock()
+
+def _checksum(file_path):
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def _empty_manifest():
+    return {'version': 0, 'first_day': None, 'last_day': None, 'stocks': {}}
+
+class Manifest:
+    """
+    Index of every stored partition, kept in data/manifest.json.
+
+    Layout:
+        {
+            "version": 12,                      # incremented on every write
+            "first_day": "2023-01-03", "last_day": "2024-06-28",
+            "stocks": {
+                "VCB": {
+                    "first_day": ..., "last_day": ..., "rows": ...,
+                    "partitions": {
+                        "2024": {"path": "VCB/2024/20240628.parquet", "first_day": ..., "last_day": ...,
+                                 "rows": ..., "size": ..., "checksum": ..., "version": 12}
+                    }
+                }
+            }
+        }
+
+    The file is rewritten through a unique temporary file and os.replace, so
+    readers always see a complete manifest, and writes hold a file lock so
+    writers of other processes (e.g. Flask workers) never lose each other's
+    updates. Writes of many partitions should run inside `batch()` so the
+    manifest is rewritten once instead of once per partition.
+    """
+    def __init__(self, data_folder):
+        """
+        Args:
+            data_folder (str): Path to the folder containing stock data
+        """
+        self.data_folder = data_folder
+        self.path = os.path.join(data_folder, MANIFEST_FILE)
+        self.lock = get_lock(os.path.join(data_folder, MANIFEST_LOCK_FILE))
+        self._data = None
+        self._loaded_mtime = None
+        # Partitions recorded inside `batch()`, saved when the outermost batch exits
+        self._pending = []
+        self._batch_depth = 0
+        self._pending_lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """
+        Get the manifest content, re-reading the file only if it changed.
+
+        Returns:
+            dict: Manifest content
+        """
+        if not self.exists():
+            return _empty_manifest()
+        mtime = os.stat(self.path).st_mtime_ns
+        if self._data is None or mtime != self._loaded_mtime:
+            with open(self.path) as f:
+                self._data = json.load(f)
+            self._loaded_mtime = mtime
+        return self._data
+
+    def _save(self, data):
+        atomic_write(self.path, lambda f: json.dump(data, f, indent=1))
+        self._data = data
+        self._loaded_mtime = os.stat(self.path).st_mtime_ns
+
+    @staticmethod
+    def _summarize(data):
+        """
+        Recompute the per-stock and global date ranges from the partitions.
+        """
+        first_days, last_days = [], []
+        for stock_entry in data['stocks'].values():
+            partitions = stock_entry['partitions'].values()
+            stock_entry['first_day'] = min((p['first_day'] for p in partitions if p['first_day']), default=None)
+            stock_entry['last_day'] = max((p['last_day'] for p in partitions if p['last_day']), default=None)
+            stock_entry['rows'] = sum(p['rows'] for p in partitions)
+            if stock_entry['first_day']:
+                first_days.append(stock_entry['first_day'])
+                last_days.append(stock_entry['last_day'])
+        data['first_day'] = min(first_days, default=None)
+        data['last_day'] = max(last_days, default=None)
+
+    def _partition_entry(self, file_path, data, version=None):
+        dates = pd.to_datetime(data.index)
+        return {
+            'path': os.path.relpath(file_path, self.data_folder),
+            'first_day': dates.min().strftime('%Y-%m-%d') if len(dates) else None,
+            'last_day': dates.max().strftime('%Y-%m-%d') if len(dates) else None,
+            'rows': int(len(data)),
+            'size': os.path.getsize(file_path),
+            'checksum': _checksum(file_path),
+            'version': version,
+        }
+
+    def record_partition(self, stock, year, file_path, data):
+        """
+        Record a newly written partition file. Inside `batch()` the manifest is
+        only saved when the batch exits.
+
+        Args:
+            stock (str): Stock symbol
+            year (int): Year of the partition
+            file_path (str): Path of the written file
+            data (pd.DataFrame): Data that was written, indexed by date
+        """
+        entry = (stock, str(year), self._partition_entry(file_path, data))
+        with self._pending_lock:
+            if self._batch_depth:
+                self._pending.append(entry)
+                return
+        self.record_partitions([entry])
+
+    def record_partitions(self, entries):
+        """
+        Record many partitions with a single manifest write and one version increment.
+
+        Args:
+            entries (list): (stock, year, partition entry) tuples, see `record_partition`
+        """
+        if not entries:
+            return
+        with self.lock:
+            # Always start from the file: another thread or process may have just written it
+            self._data = None
+            manifest = self.load()
+            manifest['version'] += 1
+            for stock, year, entry in entries:
+                stock_entry = manifest['stocks'].setdefault(stock, {'partitions': {}})
+                stock_entry['partitions'][str(year)] = dict(entry, version=manifest['version'])
+            self._summarize(manifest)
+            self._save(manifest)
+
+    @contextmanager
+    def batch(self):
+        """
+        Collect the partitions recorded inside the block, from any thread, and save
+        them with one manifest write when the outermost batch exits, even on error.
+
+        Example:
+            with get_manifest(data_folder).batch():
+                for ...:
+                    write_partition(...)
+        """
+        with self._pending_lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._pending_lock:
+                self._batch_depth -= 1
+                entries = []
+                if not self._batch_depth:
+                    entries, self._pending = self._pending, []
+            self.record_partitions(entries)
+
+    def rebuild(self):
+        """
+        Build the manifest from scratch by reading every partition in the data folder.
+
+        Returns:
+            dict: Manifest content
+        """
+        # Imported here to avoid a circular import with storage
+        from .storage import find_partition_file, read_partition
+
+        with self.lock:
+            manifest = _empty_manifest()
+            year_paths = sorted(glob.glob(os.path.join(self.data_folder, '*', '*')))
+            for year_path in year_paths:
+                stock_path, year = os.path.split(year_path)
+                if not year.isdigit() or not os.path.isdir(year_path):
+                    continue
+                try:
+                    file_path = find_partition_file(year_path)
+                except FileNotFoundError:
+                    continue
+                manifest['version'] += 1
+                stock_entry = manifest['stocks'].setdefault(os.path.basename(stock_path), {'partitions': {}})
+                stock_entry['partitions'][year] = self._partition_entry(
+                    file_path, read_partition(file_path), manifest['version'])
+            self._summarize(manifest)
+            self._save(manifest)
+            return manifest
+
+    def stocks(self):
+        return sorted(self.load()['stocks'])
+
+    def date_range(self, stock=None):
+        """
+        Get the first and last stored date, of one stock or of the whole dataset.
+
+        Returns:
+            tuple: (first_day, last_day) as pd.Timestamp, or (None, None) if there is no data
+        """
+        manifest = self.load()
+        entry = manifest if stock is None else manifest['stocks'].get(stock)
+        if entry is None or entry['first_day'] is None:
+            return None, None
+        return pd.Timestamp(entry['first_day']), pd.Timestamp(entry['last_day'])
+
+    def partitions(self, stock):
+        """
+        Get the partition entries of a stock, keyed by year.
+        """
+        return self.load()['stocks'].get(stock, {}).get('partitions', {})
+
+# Manifest instances shared per data folder, so the parsed file is reused across reads
+_instances = {}
+
+def get_manifest(data_folder):
+    """
+    Get the shared Manifest of a data folder.
+    """
+    key = os.path.abspath(data_folder)
+    with _locks_guard:
+        if key not in _instances:
+            _instances[key] = Manifest(data_folder)
+        return _instances[key]
@@ -0,0 +1,92 @@
+import pandas as pd
+from .schema import apply_panel_schema
+
+# Columns carried forward on days a stock did not trade
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+# Columns set to 0 on days a stock did not trade
+ZERO_FILL_COLUMNS = ['Volume']
+
+def trading_calendar(dates, start=None, end=None):
+    """
+    Build the trading calendar shared by HOSE and HNX from observed trading days.
+
+    Both exchanges trade on the same days, so the union of the days any stock
+    traded is the exchange calendar. Weekends are dropped in case of bad rows.
+
+    Args:
+        dates (pd.Index or list): Observed trading dates, possibly with duplicates
+        start (str, optional): First date of the calendar
+        end (str, optional): Last date of the calendar
+
+    Returns:
+        pd.DatetimeIndex: Sorted unique trading days
+    """
+    calendar = pd.DatetimeIndex(pd.to_datetime(dates)).unique().sort_values()
+    calendar = calendar[calendar.dayofweek < 5]
+    if start is not None:
+        calendar = calendar[calendar >= pd.Timestamp(start)]
+    if end is not None:
+        calendar = calendar[calendar <= pd.Timestamp(end)]
+    calendar.name = 'time'
+    return calendar
+
+def align_panel(panel, calendar=None, fill='ffill', limit=None, low_memory=False):
+    """
+    Align a wide (column, stock) panel onto a trading calendar and fill missing days.
+
+    Args:
+        panel (pd.DataFrame): Date-indexed data with (column, stock) MultiIndex columns
+        calendar (pd.DatetimeIndex, optional): Trading days. If None, uses the panel's own dates
+        fill (str, optional): 'ffill' carries prices forward and sets volume to 0 over days
+            a stock did not trade, None leaves them as NaN
+        limit (int, optional): Maximum number of consecutive days to forward fill
+        low_memory (bool): If True, uses the low-memory schema (int32 volume)
+
+    Returns:
+        tuple: (panel, mask) where mask is a calendar x stocks boolean DataFrame,
+            True on the days a stock actually traded
+    """
+    if calendar is None:
+        calendar = trading_calendar(panel.index)
+    panel = panel.reindex(calendar)
+
+    columns = panel.columns.get_level_values(0).unique()
+    mask_column = 'Close' if 'Close' in columns else columns[0]
+    mask = panel[mask_column].notna()
+
+    if fill == 'ffill':
+        level = panel.columns.get_level_values(0)
+        is_price = level.isin(PRICE_COLUMNS)
+        is_zero_fill = level.isin(ZERO_FILL_COLUMNS)
+        panel.loc[:, is_price] = panel.loc[:, is_price].ffill(limit=limit)
+        panel.loc[:, is_zero_fill] = panel.loc[:, is_zero_fill].fillna(0)
+    elif fill is not None:
+        raise ValueError(f"Unknown fill policy '{fill}', expected 'ffill' or None")
+    return apply_panel_schema(panel, low_memory=low_memory), mask
+
+def build_panel(frames, columns=None, calendar=None, fill='ffill', limit=None, low_memory=False):
+    """
+    Build a date-indexed multi-stock panel in one pass: stack all stocks in long
+    format, pivot them onto a shared date index, then align and fill.
+
+    Args:
+        frames (dict): Stock symbol -> DataFrame indexed by date
+        columns (list, optional): Columns to keep. If None, keeps all columns
+        calendar (pd.DatetimeIndex, optional): Trading days. If None, uses the union of all dates
+        fill (str, optional): Fill policy, see `align_panel`
+        limit (int, optional): Maximum number of consecutive days to forward fill
+        low_memory (bool): If True, uses the low-memory schema (int32 volume)
+
+    Returns:
+        tuple: (panel, mask), panel has (column, stock) MultiIndex columns
+    """
+    stocks = list(frames)
+    long = pd.concat([f if columns is None else f[columns] for f in frames.values()],
+                     keys=stocks, names=['stock', 'time'])
+    long.index = long.index.set_levels(pd.to_datetime(long.index.levels[1]), level=1)
+    long = long[~long.index.duplicated(keep='last')]
+
+    wide = long.unstack(level='stock')
+    # unstack sorts stocks, restore the requested order
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([long.columns, stocks]))
+    return align_panel(wide, calendar=calendar, fill=fill, limit=limit, low_memory=low_memory)
@@ -0,0 +1,110 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from .storage import read_partition
+from .panel import build_panel
+
+class LazyScan:
+    """
+    Lazily evaluated query over the stored partitions.
+
+    Nothing is read until `collect` or `to_numpy` is called. Partitions whose
+    date range (from the manifest) falls outside [start, end] are skipped, and
+    the column selection and date filter are pushed down into the file reads.
+    """
+    def __init__(self, data_folder, manifest, stocks, start=None, end=None, columns=None,
+                 n_workers=None, low_memory=False):
+        self.data_folder = data_folder
+        self.manifest = manifest
+        self.stocks = list(stocks)
+        self.start = pd.Timestamp(start) if start is not None else None
+        self.end = pd.Timestamp(end) if end is not None else None
+        self.columns = list(columns) if columns is not None else None
+        self.n_workers = n_workers
+        self.low_memory = low_memory
+
+    def _replace(self, **kwargs):
+        params = dict(data_folder=self.data_folder, manifest=self.manifest, stocks=self.stocks,
+                      start=self.start, end=self.end, columns=self.columns,
+                      n_workers=self.n_workers, low_memory=self.low_memory)
+        params.update(kwargs)
+        return LazyScan(**params)
+
+    def select(self, columns):
+        """
+        Get a new scan reading only `columns`.
+        """
+        return self._replace(columns=columns)
+
+    def filter(self, start=None, end=None):
+        """
+        Get a new scan narrowed to [start, end].
+        """
+        if start is not None and self.start is not None:
+            start = max(self.start, pd.Timestamp(start))
+        if end is not None and self.end is not None:
+            end = min(self.end, pd.Timestamp(end))
+        return self._replace(start=start if start is not None else self.start,
+                             end=end if end is not None else self.end)
+
+    def partitions(self):
+        """
+        Get the partition files the scan will read, after pruning by date range.
+
+        Returns:
+            list: (stock, file_path) tuples
+        """
+        selected = []
+        for stock in self.stocks:
+            for year, entry in sorted(self.manifest.partitions(stock).items()):
+                if self.start is not None and entry['last_day'] and pd.Timestamp(entry['last_day']) < self.start:
+                    continue
+                if self.end is not None and entry['first_day'] and pd.Timestamp(entry['first_day']) > self.end:
+                    continue
+                selected.append((stock, os.path.join(self.data_folder, entry['path'])))
+        return selected
+
+    def _read(self, partition):
+        stock, file_path = partition
+        return stock, read_partition(file_path, columns=self.columns, start=self.start, end=self.end,
+                                     low_memory=self.low_memory)
+
+    def collect(self):
+        """
+        Run the scan.
+
+        Returns:
+            pd.DataFrame: Date-indexed data with (column, stock) MultiIndex columns
+        """
+        partitions = self.partitions()
+        n_workers = self.n_workers or os.cpu_count() or 1
+        if n_workers <= 1 or len(partitions) <= 1:
+            results = list(map(self._read, partitions))
+        else:
+            with ThreadPoolExecutor(max_workers=n_workers) as pool:
+                results = list(pool.map(self._read, partitions))
+
+        frames = {}
+        for stock, data in results:
+            frames.setdefault(stock, []).append(data)
+        frames = {stock: pd.concat(frames[stock]) for stock in self.stocks if stock in frames}
+        if not frames:
+            return pd.DataFrame()
+        data, _ = build_panel(frames, fill=None, low_memory=self.low_memory)
+        return data
+
+    def to_numpy(self, column='Close', dtype=None):
+        """
+        Run the scan for a single column.
+
+        Returns:
+            np.ndarray: Array of shape n_days x n_stocks
+        """
+        data = self.select([column]).collect()
+        if data.empty:
+            return pd.DataFrame(columns=self.stocks).to_numpy(dtype=dtype)
+        return data[column].reindex(columns=self.stocks).to_numpy(dtype=dtype)
+
+    def __repr__(self):
+        return (f"LazyScan(stocks={len(self.stocks)}, start={self.start}, end={self.end}, "
+                f"columns={self.columns}, partitions={len(self.partitions())})")
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+# Explicit dtypes of the OHLCV data downloaded from vnstock
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+PRICE_DTYPE = np.float32
+VOLUME_COLUMN = 'Volume'
+VOLUME_DTYPE = np.int64
+LOW_MEMORY_VOLUME_DTYPE = np.int32
+INDEX_NAME = 'time'
+
+# Columns only useful for auditing downloads, dropped in low-memory mode
+AUDIT_COLUMNS = ['logtime']
+
+def _cast_volume(volume, low_memory=False):
+    """
+    Cast a volume column to int64, or int32 in low-memory mode when it fits.
+    Missing values use the nullable Int64/Int32 dtype, so volumes stay exact.
+    """
+    volume = pd.to_numeric(volume, errors='coerce')
+    dtype = np.dtype(VOLUME_DTYPE).name
+    if low_memory and volume.abs().max() < np.iinfo(LOW_MEMORY_VOLUME_DTYPE).max:
+        dtype = np.dtype(LOW_MEMORY_VOLUME_DTYPE).name
+    if volume.isna().any():
+        # Nullable integers keep missing days as <NA> instead of rounding through a float
+        dtype = dtype.capitalize()
+    return volume.astype(dtype)
+
+def apply_schema(data, low_memory=False):
+    """
+    Cast stock data to the compact OHLCV schema: datetime64 index, float32 prices,
+    int64 volume (nullable Int64 when values are missing) and categorical text
+    columns (ticker, logtime).
+
+    Args:
+        data (pd.DataFrame): Stock data indexed by date
+        low_memory (bool): If True, also stores volume as int32 when it fits and
+            drops audit columns
+
+    Returns:
+        pd.DataFrame: Data with the schema applied
+    """
+    data = data.copy()
+    data.index = pd.to_datetime(data.index)
+    data.index.name = INDEX_NAME
+
+    if low_memory:
+        data = data.drop(columns=[c for c in AUDIT_COLUMNS if c in data.columns])
+
+    for col in data.columns:
+        if col in PRICE_COLUMNS:
+            data[col] = pd.to_numeric(data[col], errors='coerce').astype(PRICE_DTYPE)
+        elif col == VOLUME_COLUMN:
+            data[col] = _cast_volume(data[col], low_memory)
+        elif pd.api.types.is_object_dtype(data[col]) or pd.api.types.is_string_dtype(data[col]):
+            data[col] = data[col].astype('category')
+    return data
+
+def apply_panel_schema(panel, low_memory=False):
+    """
+    Re-apply the compact schema to a multi-stock panel with (column, stock) columns.
+
+    Concatenating years or pivoting stocks onto a shared date index widens the
+    dtypes (float64 volume with NaN on days a stock did not trade, object text
+    columns), so they are cast back: float32 prices, integer volume (nullable
+    Int64, or Int32 in low-memory mode, where days are missing) and categorical
+    text columns.
+
+    Args:
+        panel (pd.DataFrame): Date-indexed panel, with (column, stock) MultiIndex or plain columns
+        low_memory (bool): If True, stores volume as 32-bit integers when it fits
+
+    Returns:
+        pd.DataFrame: Panel with the schema applied
+    """
+    panel = panel.copy()
+    for col in panel.columns:
+        name = col[0] if isinstance(col, tuple) else col
+        if name in PRICE_COLUMNS:
+            panel[col] = pd.to_numeric(panel[col], errors='coerce').astype(PRICE_DTYPE)
+        elif name == VOLUME_COLUMN:
+            panel[col] = _cast_volume(panel[col], low_memory)
+        elif pd.api.types.is_object_dtype(panel[col]) or pd.api.types.is_string_dtype(panel[col]):
+            panel[col] = panel[col].astype('category')
+    return panel
@@ -0,0 +1,278 @@
+import os
+import glob
+import argparse
+import datetime
+import pandas as pd
+from .manifest import get_manifest
+from .schema import INDEX_NAME, apply_schema
+
+# File extension used by each supported storage backend
+STORAGE_FORMATS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+DEFAULT_STORAGE_FORMAT = 'parquet'
+
+# Columnar formats are preferred over csv when a partition holds both
+_READ_PRIORITY = ['parquet', 'feather', 'csv']
+
+# Sub folder of a partition keeping the snapshots retained by compaction
+VERSIONS_FOLDER = '_versions'
+
+def _check_storage_format(storage_format):
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown storage format '{storage_format}', "
+                         f"expected one of {list(STORAGE_FORMATS)}")
+
+def _format_of(file_path):
+    """
+    Get the storage format of a partition file from its extension.
+    """
+    ext = os.path.splitext(file_path)[1]
+    for storage_format, format_ext in STORAGE_FORMATS.items():
+        if ext == format_ext:
+            return storage_format
+    return None
+
+def write_partition(data, path, file_stem, storage_format=DEFAULT_STORAGE_FORMAT):
+    """
+    Write one ticker-year partition to disk and record it in the manifest.
+
+    Args:
+        data (pd.DataFrame): Stock data indexed by date
+        path (str): Partition folder, i.e. data/<STOCK>/<YEAR>
+        file_stem (str): File name without extension (usually the download time)
+        storage_format (str): One of 'csv', 'parquet', 'feather'
+
+    Returns:
+        str: Path of the written file
+    """
+    _check_storage_format(storage_format)
+    os.makedirs(path, exist_ok=True)
+    file_path = os.path.join(path, f"{file_stem}{STORAGE_FORMATS[storage_format]}")
+    _write_file(data, file_path, storage_format)
+    _record(path, file_path, data)
+    return file_path
+
+def _write_file(data, file_path, storage_format):
+    if storage_format == 'csv':
+        data.to_csv(file_path)
+    else:
+        data = apply_schema(data)
+        if storage_format == 'parquet':
+            data.to_parquet(file_path)
+        else:
+            # Feather cannot store an index, keep it as the first column
+            data.reset_index().to_feather(file_path)
+
+def _record(path, file_path, data):
+    # Partitions live in <data_folder>/<STOCK>/<YEAR>
+    stock_path, year = os.path.split(os.path.normpath(path))
+    data_folder, stock = os.path.split(stock_path)
+    get_manifest(data_folder).record_partition(stock, year, file_path, data)
+
+def read_partition(file_path, columns=None, start=None, end=None, low_memory=False):
+    """
+    Read one partition file written by `write_partition`, with the OHLCV schema applied.
+
+    Args:
+        file_path (str): Path to the partition file
+        columns (list, optional): Columns to load. If None, loads all columns
+        start (str, optional): First date to load
+        end (str, optional): Last date to load
+        low_memory (bool): If True, uses the low-memory schema (int32 volume, no audit columns)
+
+    Returns:
+        pd.DataFrame: Stock data indexed by date
+    """
+    storage_format = _format_of(file_path)
+    if storage_format == 'parquet':
+        # Column selection and date filters are pushed down into the parquet reader
+        filters = []
+        if start is not None:
+            filters.append((INDEX_NAME, '>=', pd.Timestamp(start)))
+        if end is not None:
+            filters.append((INDEX_NAME, '<=', pd.Timestamp(end)))
+        data = pd.read_parquet(file_path, columns=columns, filters=filters or None)
+    elif storage_format == 'feather':
+        data = pd.read_feather(file_path)
+        data = data.set_index(data.columns[0])
+    else:
+        data = pd.read_csv(file_path, header=[0], index_col=0)
+
+    if columns is not None:
+        data = data[columns]
+    data = apply_schema(data, low_memory=low_memory)
+    if storage_format != 'parquet' and (start is not None or end is not None):
+        data = data.loc[start:end]
+    return data
+
+def _snapshot_files(path):
+    """
+    List the snapshot files of a partition folder, oldest first.
+
+    Snapshots are named after their download time, so name order is time order.
+    A columnar file sorts after a csv file with the same name.
+    """
+    files = []
+    for priority, storage_format in enumerate(reversed(_READ_PRIORITY)):
+        for file_path in glob.glob(os.path.join(path, f"*{STORAGE_FORMATS[storage_format]}")):
+            stem = os.path.splitext(os.path.basename(file_path))[0]
+            files.append((stem, priority, file_path))
+    return [file_path for _, _, file_path in sorted(files)]
+
+def find_partition_file(path):
+    """
+    Find the newest snapshot inside a partition folder.
+
+    Args:
+        path (str): Partition folder, i.e. data/<STOCK>/<YEAR>
+
+    Returns:
+        str: Path to the partition file
+
+    Raises:
+        FileNotFoundError: If the folder has no readable file
+    """
+    files = _snapshot_files(path)
+    if not files:
+        raise FileNotFoundError(f"No data file found in {path}")
+    return files[-1]
+
+def resolve_partition_file(data_folder, stock, year):
+    """
+    Get the current file of a partition from the manifest, in constant time.
+    Falls back to listing the partition folder if the manifest has no entry.
+
+    Returns:
+        str: Path to the partition file
+    """
+    entry = get_manifest(data_folder).partitions(stock).get(str(year))
+    if entry is not None:
+        file_path = os.path.join(data_folder, entry['path'])
+        if os.path.exists(file_path):
+            return file_path
+    return find_partition_file(os.path.join(data_folder, stock, str(year)))
+
+def compact_partition(path, keep=0, storage_format=DEFAULT_STORAGE_FORMAT):
+    """
+    Merge all snapshots of a partition into a single current file.
+
+    Rows of newer snapshots win over older ones on the same date. The merged file
+    is written under a temporary name and renamed atomically, so readers never
+    see a partial file. Older snapshots are then moved to `_versions` (the newest
+    `keep` of them) or deleted.
+
+    Args:
+        path (str): Partition folder, i.e. data/<STOCK>/<YEAR>
+        keep (int): Number of previous snapshots to retain in `_versions`
+        storage_format (str): Format of the compacted file
+
+    Returns:
+        str: Path of the current file, or None if the partition is empty
+    """
+    _check_storage_format(storage_format)
+    files = _snapshot_files(path)
+    if not files:
+        return None
+    if len(files) == 1 and _format_of(files[0]) == storage_format:
+        _prune_versions(path, keep)
+        return files[0]
+
+    data = pd.concat([read_partition(f) for f in files])
+    data = data[~data.index.duplicated(keep='last')].sort_index()
+
+    # The compacted file must sort after every snapshot it replaces
+    newest_stem = os.path.splitext(os.path.basename(files[-1]))[0]
+    file_stem = max(datetime.datetime.now().strftime('%Y%m%d%H%M%S'), newest_stem + '_c')
+    ext = STORAGE_FORMATS[storage_format]
+    file_path = os.path.join(path, f"{file_stem}{ext}")
+    tmp_path = os.path.join(path, f".{file_stem}.tmp{ext}")
+    _write_file(data, tmp_path, storage_format)
+    os.replace(tmp_path, file_path)
+    _record(path, file_path, data)
+
+    versions_path = os.path.join(path, VERSIONS_FOLDER)
+    for f in files:
+        if f == file_path:
+            continue
+        if keep > 0:
+            os.makedirs(versions_path, exist_ok=True)
+            os.replace(f, os.path.join(versions_path, os.path.basename(f)))
+        else:
+            os.remove(f)
+    _prune_versions(path, keep)
+    return file_path
+
+def _prune_versions(path, keep):
+    versions_path = os.path.join(path, VERSIONS_FOLDER)
+    if not os.path.isdir(versions_path):
+        return
+    old_versions = _snapshot_files(versions_path)
+    for f in old_versions[:max(len(old_versions) - keep, 0)]:
+        os.remove(f)
+
+def compact_store(data_folder, keep=0, storage_format=DEFAULT_STORAGE_FORMAT):
+    """
+    Compact every partition of the data folder, see `compact_partition`.
+
+    Returns:
+        int: Number of compacted partitions
+    """
+    n_compacted = 0
+    # The manifest is saved once for the whole store
+    with get_manifest(data_folder).batch():
+        for path in sorted(glob.glob(os.path.join(data_folder, '*', '*'))):
+            if not os.path.basename(path).isdigit() or not os.path.isdir(path):
+                continue
+            if compact_partition(path, keep=keep, storage_format=storage_format) is not None:
+                n_compacted += 1
+                print(f"COMPACTED: {path}")
+    return n_compacted
+
+def migrate_store(data_folder, storage_format=DEFAULT_STORAGE_FORMAT, remove_source=False):
+    """
+    Convert an existing data/<STOCK>/<YEAR>/*.csv tree to a columnar format.
+
+    Args:
+        data_folder (str): Root folder of the stock data
+        storage_format (str): Target format, 'parquet' or 'feather'
+        remove_source (bool): If True, delete the csv files once converted
+
+    Returns:
+        int: Number of converted partition files
+    """
+    _check_storage_format(storage_format)
+    if storage_format == 'csv':
+        raise ValueError("Target format of a migration must be columnar")
+
+    n_converted = 0
+    # The manifest is saved once for the whole store
+    with get_manifest(data_folder).batch():
+        for file_path in sorted(glob.glob(os.path.join(data_folder, '*', '*', '*.csv'))):
+            path, file_name = os.path.split(file_path)
+            file_stem = os.path.splitext(file_name)[0]
+            data = read_partition(file_path)
+            write_partition(data, path, file_stem, storage_format)
+            if remove_source:
+                os.remove(file_path)
+            n_converted += 1
+            print(f"MIGRATED: {file_path} -> {storage_format}")
+    return n_converted
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maintain the stock data folder")
+    parser.add_argument('data_folder')
+    parser.add_argument('--format', default=DEFAULT_STORAGE_FORMAT, choices=['parquet', 'feather'])
+    parser.add_argument('--remove-source', action='store_true',
+                        help="delete csv files once migrated")
+    parser.add_argument('--compact', action='store_true',
+                        help="merge the snapshots of each partition instead of migrating")
+    parser.add_argument('--keep', type=int, default=0,
+                        help="number of previous snapshots retained by compaction")
+    args = parser.parse_args()
+    if args.compact:
+        compact_store(args.data_folder, keep=args.keep, storage_format=args.format)
+    else:
+        migrate_store(args.data_folder, args.format, args.remove_source)
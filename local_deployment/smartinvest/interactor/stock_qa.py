@@ -49,8 +49,8 @@ class StockQASystem:
             
             # Get data for available stocks from current year
             current_year = pd.Timestamp.now().year
-            data = data_driver.get_multiple_stocks_data(available_stocks, current_year)
-            self.price_data = data["Close"]
+            self.price_data = data_driver.get_close_prices(available_stocks, start=f"{current_year}-01-01",
+                                                           end=f"{current_year}-12-31")
             
             # Initialize the language model
             if self.model_type == "openai":
@@ -149,8 +149,7 @@ class StockQASystem:
             if year is None:
                 year = pd.Timestamp.now().year
                 
-            data = self.data_driver.get_multiple_stocks_data(stocks, year)
-            self.price_data = data["Close"]
+            self.price_data = self.data_driver.get_close_prices(stocks, start=f"{year}-01-01", end=f"{year}-12-31")
             
             # Recreate the agent with new data
             self.agent = create_pandas_dataframe_agent(
@@ -0,0 +1,192 @@
+import json
+import numpy as np
+
+# Layers of the saved models:
+#   smartinvest/model/*.keras, *.h5   Conv1D -> [Conv1D] -> Flatten -> Dense -> Dense
+#   train/training.py                  Bidirectional(LSTM) -> Dense -> Dropout -> Dense
+# Dropout is the identity at inference time and is not exported.
+
+def _sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1)
+
+_ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+}
+
+def _activation_name(activation):
+    return activation if isinstance(activation, str) else activation.__name__
+
+def _export_kernel(layer, name, arrays):
+    weights = layer.get_weights()
+    kernel = weights[0]
+    # Layers built with use_bias=False have no bias weight
+    bias = weights[1] if len(weights) > 1 else np.zeros(kernel.shape[-1])
+    arrays[f"{name}_kernel"] = kernel.astype(np.float32)
+    arrays[f"{name}_bias"] = bias.astype(np.float32)
+
+def export_keras_model(model, npz_path):
+    """
+    Export the weights of a Keras Conv1D/Bidirectional LSTM + Dense model to a compact .npz.
+
+    Args:
+        model (tf.keras.Model): Loaded Keras model
+        npz_path (str): Path of the .npz file to write
+    """
+    layers = []
+    arrays = {}
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        name = f"l{len(layers)}"
+        if kind == 'Bidirectional':
+            if layer.forward_layer.__class__.__name__ != 'LSTM':
+                raise ValueError(f"Unsupported recurrent layer: {layer.forward_layer.__class__.__name__}")
+            for direction, lstm in [('fw', layer.forward_layer), ('bw', layer.backward_layer)]:
+                kernel, recurrent_kernel, bias = lstm.get_weights()
+                arrays[f"{name}_{direction}_kernel"] = kernel.astype(np.float32)
+                arrays[f"{name}_{direction}_recurrent_kernel"] = recurrent_kernel.astype(np.float32)
+                arrays[f"{name}_{direction}_bias"] = bias.astype(np.float32)
+            lstm = layer.forward_layer
+            layers.append({
+                'type': 'bilstm',
+                'name': name,
+                'units': lstm.units,
+                'activation': _activation_name(lstm.activation),
+                'recurrent_activation': _activation_name(lstm.recurrent_activation),
+                'merge_mode': layer.merge_mode,
+            })
+        elif kind == 'Conv1D':
+            config = layer.get_config()
+            if config['padding'] != 'valid' or config.get('groups', 1) != 1 \
+                    or config.get('data_format', 'channels_last') != 'channels_last':
+                raise ValueError(f"Unsupported Conv1D config for the numpy backend: padding={config['padding']}, "
+                                 f"groups={config.get('groups', 1)}, data_format={config.get('data_format')}")
+            _export_kernel(layer, name, arrays)
+            layers.append({
+                'type': 'conv1d',
+                'name': name,
+                'strides': config['strides'][0],
+                'dilation_rate': config['dilation_rate'][0],
+                'activation': _activation_name(layer.activation),
+            })
+        elif kind == 'Flatten':
+            layers.append({'type': 'flatten', 'name': name})
+        elif kind == 'Dense':
+            _export_kernel(layer, name, arrays)
+            layers.append({'type': 'dense', 'name': name, 'activation': _activation_name(layer.activation)})
+        elif kind in ('Dropout', 'InputLayer'):
+            continue
+        else:
+            raise ValueError(f"Unsupported layer for the numpy backend: {kind}")
+
+    input_shape = [None if d is None else int(d) for d in model.input_shape]
+    np.savez_compressed(npz_path, layers=np.array(json.dumps(layers)),
+                        input_shape=np.array(json.dumps(input_shape)), **arrays)
+
+class NumpyModel:
+    """
+    Float32 NumPy implementation of the forward pass of an exported model.
+
+    Exposes `predict` like a Keras model, so Predictor can use either backend.
+    """
+    def __init__(self, npz_path):
+        """
+        Args:
+            npz_path (str): Path of a file written by `export_keras_model`
+        """
+        with np.load(npz_path) as f:
+            self.layers = json.loads(str(f['layers']))
+            # (batch, len_x, n_stocks) like Keras `model.input_shape`, None if not exported
+            self.input_shape = tuple(json.loads(str(f['input_shape']))) if 'input_shape' in f.files else None
+            self.weights = {k: f[k] for k in f.files if k not in ('layers', 'input_shape')}
+
+    def _lstm(self, X, name, units, activation, recurrent_activation, reverse=False):
+        """
+        Run one LSTM direction over a batch and return the last hidden state.
+
+        Keras orders the gates as input, forget, cell, output.
+        """
+        kernel = self.weights[f"{name}_kernel"]
+        recurrent_kernel = self.weights[f"{name}_recurrent_kernel"]
+        bias = self.weights[f"{name}_bias"]
+        act = _ACTIVATIONS[activation]
+        rec_act = _ACTIVATIONS[recurrent_activation]
+
+        n_samples, n_steps, _ = X.shape
+        # Input projections of every time step in one matmul
+        Z_x = X @ kernel + bias
+        h = np.zeros((n_samples, units), dtype=np.float32)
+        c = np.zeros((n_samples, units), dtype=np.float32)
+        steps = range(n_steps - 1, -1, -1) if reverse else range(n_steps)
+        for t in steps:
+            z = Z_x[:, t] + h @ recurrent_kernel
+            i = rec_act(z[:, :units])
+            f = rec_act(z[:, units:2*units])
+            g = act(z[:, 2*units:3*units])
+            o = rec_act(z[:, 3*units:])
+            c = f * c + i * g
+            h = o * act(c)
+        return h
+
+    def _conv1d(self, X, name, strides, dilation_rate, activation):
+        """
+        Run a Conv1D layer with 'valid' padding over a batch of shape (n_samples, n_steps, n_channels).
+
+        Keras kernels have shape (kernel_size, in_channels, filters), so each tap is
+        one matmul over a strided slice of the input.
+        """
+        kernel = self.weights[f"{name}_kernel"]
+        bias = self.weights[f"{name}_bias"]
+        kernel_size = kernel.shape[0]
+        n_out = (X.shape[1] - dilation_rate * (kernel_size - 1) - 1) // strides + 1
+        if n_out <= 0:
+            raise ValueError(f"Input of {X.shape[1]} steps is too short for layer {name}")
+        out = np.broadcast_to(bias, (X.shape[0], n_out, kernel.shape[2])).copy()
+        for j in range(kernel_size):
+            start = j * dilation_rate
+            out += X[:, start:start + (n_out - 1) * strides + 1:strides] @ kernel[j]
+        return _ACTIVATIONS[activation](out)
+
+    def predict(self, X, batch_size=1024, verbose=0):
+        """
+        Run the model on a batch of windows.
+
+        Args:
+            X (np.ndarray): Windows of shape (n_samples, len_x, n_stocks)
+            batch_size (int): Number of windows processed at once
+
+        Returns:
+            np.ndarray: Predictions of shape (n_samples, n_outputs)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        outputs = [self._forward(X[i:i+batch_size]) for i in range(0, len(X), batch_size)]
+        return np.concatenate(outputs) if outputs else np.empty((0, 0), dtype=np.float32)
+
+    def _forward(self, X):
+        out = X
+        for layer in self.layers:
+            if layer['type'] == 'bilstm':
+                args = (layer['units'], layer['activation'], layer['recurrent_activation'])
+                h_fw = self._lstm(out, f"{layer['name']}_fw", *args)
+                h_bw = self._lstm(out, f"{layer['name']}_bw", *args, reverse=True)
+                if layer['merge_mode'] == 'concat':
+                    out = np.concatenate([h_fw, h_bw], axis=1)
+                elif layer['merge_mode'] == 'sum':
+                    out = h_fw + h_bw
+                elif layer['merge_mode'] == 'ave':
+                    out = (h_fw + h_bw) / 2
+                elif layer['merge_mode'] == 'mul':
+                    out = h_fw * h_bw
+                else:
+                    raise ValueError(f"Unsupported merge mode: {layer['merge_mode']}")
+            elif layer['type'] == 'conv1d':
+                out = self._conv1d(out, layer['name'], layer['strides'], layer['dilation_rate'], layer['activation'])
+            elif layer['type'] == 'flatten':
+                # Same row-major order as Keras Flatten on channels_last data
+                out = out.reshape(len(out), -1)
+            else:
+                out = out @ self.weights[f"{layer['name']}_kernel"] + self.weights[f"{layer['name']}_bias"]
+                out = _ACTIVATIONS[layer['activation']](out)
+        return out
@@ -1,24 +1,67 @@
-import copy
+import os
+import glob
+import json
 import numpy as np
 import pandas as pd
-import tensorflow as tf
-from tensorflow.keras.losses import MeanSquaredError
-from skimage.util import view_as_windows
 import matplotlib.pyplot as plt
 import io
 import base64
+from .numpy_backend import NumpyModel, export_keras_model
+from ..processing.feature_engineering import (clean_returns, adjusted_prices, pct_change,
+                                              sliding_windows, valid_windows, get_X as get_windows)
 
-class Predictor:
-    def __init__(self, data_driver, model_path='smartinvest/model/exp_1.4_20250518.keras') -> None:
-        self.model_path = model_path
-        self.data_driver = data_driver
+def load_keras_model(model_path):
+    # TensorFlow is imported here so the numpy backend never pays for it
+    import tensorflow as tf
+    from tensorflow.keras.losses import MeanSquaredError
+    return tf.keras.models.load_model(model_path, custom_objects={'mse': MeanSquaredError()})
 
-        self.model = tf.keras.models.load_model(self.model_path, custom_objects={'mse': MeanSquaredError()})
-        print("MODEL SUMMARY: ", self.model.summary())
+def load_model(model_path, backend='keras'):
+    """
+    Load a saved model with the selected inference backend.
 
-    @property
-    def watch_list(self):
-        wl = ['VCB', 'BID', 'FPT', 'HPG', 'GAS', 'CTG', 'VHM', 'TCB', 'VIC',
+    Args:
+        model_path (str): Path to the saved Keras model (.keras or .h5)
+        backend (str): 'keras' runs the model with TensorFlow. 'numpy' runs a float32
+            NumPy forward pass from `<model_path>.npz`, exported once with TensorFlow
+            if it does not exist yet
+
+    Returns:
+        Model exposing `predict(X)`
+    """
+    if backend == 'keras':
+        return load_keras_model(model_path)
+    if backend == 'numpy':
+        npz_path = os.path.splitext(model_path)[0] + '.npz'
+        if not os.path.exists(npz_path):
+            export_keras_model(load_keras_model(model_path), npz_path)
+        return NumpyModel(npz_path)
+    raise ValueError(f"Unknown backend '{backend}', expected 'keras' or 'numpy'")
+
+def load_model_info(model_path):
+    """
+    Read the `<model>.json` metadata saved next to a model by the training pipeline.
+
+    Returns:
+        dict: Metadata such as 'stocks' (order of the model columns) and 'len_x', empty if there is none
+    """
+    info_path = os.path.splitext(model_path)[0] + '.json'
+    if not os.path.exists(info_path):
+        return {}
+    with open(info_path) as f:
+        return json.load(f)
+
+def latest_model_path(model_folder, pattern='*.keras'):
+    """
+    Get the newest versioned model in a folder. Versions are named so that they sort by date.
+
+    Returns:
+        str: Path to the model, None if the folder has no model
+    """
+    paths = sorted(glob.glob(os.path.join(model_folder, pattern)))
+    return paths[-1] if paths else None
+
+WATCH_LIST = ['VCB', 'BID', 'FPT', 'HPG', 'GAS', 'CTG', 'VHM', 'TCB', 'VIC',
         'GVR', 'VPB', 'VNM', 'MBB', 'MSN', 'ACB', 'MWG', 'LPB',
         'HVN', 'BSR', 'SAB', 'HDB', 'BCM', 'VEA', 'PLX', 'STB', 'VJC',
         'VIB', 'SSB', 'SSI', 'FOX', 'DGC', 'VRE', 'SHB', 'TPB', 'POW',
@@ -29,10 +72,66 @@ class Predictor:
         'DHG', 'SHS', 'TCH', 'THD', 'PVI', 'HAG', 'VSH',
         'CMG', 'VCS', 'VCG', 'VIX', 'BAB', 'VTP', 'DGW',
         'PVT', 'HDG', 'DXG', 'PC1', 'BWE', 'SBT',
-        'CEO', "DBC", "TCM"] 
-        return wl
+        'CEO', "DBC", "TCM"]
+
+def model_len_x(model, model_info, default):
+    """
+    Get the number of days in one input window of a model: its fixed input length,
+    else the length recorded by the training pipeline, else `default`.
+    """
+    input_shape = getattr(model, 'input_shape', None)
+    if input_shape is not None and len(input_shape) == 3 and input_shape[1] is not None:
+        return int(input_shape[1])
+    return int(model_info.get('len_x', default))
+
+class Predictor:
+    # Number of days in one input window of the model
+    len_x = 60
 
-    def plot_predictions(self, predictions_df):
+    def __init__(self, data_driver, model_path='smartinvest/model/exp_1.4_20250518.keras', backend='keras',
+                 model_paths=None) -> None:
+        """
+        Args:
+            data_driver (DataDriver): Source of the close prices
+            model_path (str): Path to the main model, used by `get_prediction`
+            backend (str): Inference backend, 'keras' or 'numpy'
+            model_paths (list, optional): Paths to additional models, loaded once next to
+                the main one and scored together by `get_ensemble_prediction`
+        """
+        self.model_path = model_path
+        self.data_driver = data_driver
+        self.backend = backend
+        # Models from the training pipeline record their stocks and window length
+        self.model_info = load_model_info(model_path)
+
+        # Registry of loaded models, keyed by file name without extension, with the
+        # window length and stocks each model expects
+        self.models = {}
+        self.model_specs = {}
+        for path in [model_path] + list(model_paths or []):
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name in self.models:
+                continue
+            model = load_model(path, backend=backend)
+            info = load_model_info(path)
+            self.models[name] = model
+            self.model_specs[name] = {
+                'len_x': model_len_x(model, info, Predictor.len_x),
+                'stocks': list(info.get('stocks', WATCH_LIST)),
+            }
+        self.model = next(iter(self.models.values()))
+        self.len_x = next(iter(self.model_specs.values()))['len_x']
+        if backend == 'keras':
+            print("MODEL SUMMARY: ", self.model.summary())
+
+    @property
+    def watch_list(self):
+        if 'stocks' in self.model_info:
+            return list(self.model_info['stocks'])
+        return list(WATCH_LIST)
+
+    @staticmethod
+    def plot_predictions(predictions_df):
         """
         Create a bar chart visualization of the top 10 highest and lowest predictions.
         
@@ -77,80 +176,187 @@ class Predictor:
         
         return plot_base64
 
-    def get_prediction(self):
-        interested_stocks = self.watch_list
-        current_year = pd.Timestamp.now().year
-        data = self.data_driver.read_stocks_years(interested_stocks, [current_year-1, current_year])
+    def get_prediction(self, latest_only=True):
+        """
+        Rank the watch list by the model prediction for the latest day.
         
-        X = self.preprocessing(data)
+        Args:
+            latest_only (bool): If True, loads only the trailing days needed and runs
+                the model on the latest window. If False, scores every window of the
+                last two years and keeps the latest one
+                
+        Returns:
+            pd.DataFrame: 'stock' and 'prediction' columns, best prediction first
+        """
+        if latest_only:
+            X = self.get_latest_window()
+        else:
+            current_year = pd.Timestamp.now().year
+            returns = self.data_driver.get_features('returns', self.watch_list, start=f"{current_year-1}-01-01")
+            X = get_windows(returns.to_numpy(), len_x=self.len_x)
+        if not len(X):
+            raise ValueError(f"Not enough data to predict: the model needs {self.len_x + 1} stored days "
+                             f"of returns without missing values")
         print("DATA:", X.shape)
-        y_pred = self.model.predict(X)
+        y_pred = self.model.predict(X, verbose=0)
         print("Y_PRED: ", len(y_pred))
 
         result_df = pd.DataFrame({"stock":self.watch_list, "prediction": y_pred[-1]})
         result_df = result_df.sort_values(by="prediction", ascending=False)
         return result_df
 
-    @staticmethod
-    def clean_price(df_):
-        df = df_.copy()
-        prev_price = df.shift(1)
+    def get_latest_window(self):
+        """
+        Build the single model input window ending on the last stored day.
+        
+        Returns:
+            np.ndarray: Array of shape (1, len_x, n_stocks)
+        """
+        # The returns are read from the feature store, already cleaned, and the
+        # first window is dropped by `get_windows`, so one extra day is loaded
+        returns = self.data_driver.get_features('returns', self.watch_list, last=self.len_x + 1)
+        return get_windows(returns.to_numpy(), len_x=self.len_x)[-1:]
+
+    def get_predictions_last_n(self, n_days):
+        """
+        Score the windows ending on each of the last `n_days` stored days in one batch, for backtests.
         
-        # Chuyển sang delta-pct
-        delta_pct = (df - prev_price)/prev_price
+        Args:
+            n_days (int): Number of trailing days to score
+            
+        Returns:
+            pd.DataFrame: Predictions indexed by the window end date, one column per stock
+        """
+        returns = self.data_driver.get_features('returns', self.watch_list, last=self.len_x + n_days)
+        X = get_windows(returns.to_numpy(), len_x=self.len_x)[-n_days:]
+        if not len(X):
+            return pd.DataFrame(columns=self.watch_list, dtype=np.float32)
+        y_pred = self.model.predict(X, verbose=0)
+        return pd.DataFrame(y_pred, index=returns.index[-len(X):], columns=self.watch_list)
+
+    def get_predictions(self, start=None, end=None, batch_size=4096):
+        """
+        Score every window ending between `start` and `end` with a few large model
+        calls, for backtests over long periods.
+
+        Args:
+            start (str, optional): First window end date. If None, the first stored day
+            end (str, optional): Last window end date. If None, the last stored day
+            batch_size (int): Number of windows gathered and scored per model call
+
+        Returns:
+            pd.DataFrame: Predictions indexed by the window end date, one column per
+                stock, NaN on days whose window has missing data
+        """
+        returns = self.data_driver.get_features('returns', self.watch_list, end=end)
+        if len(returns) < self.len_x:
+            return pd.DataFrame(columns=self.watch_list, dtype=np.float32)
+        values = returns.to_numpy()
+        windows = sliding_windows(values, self.len_x)
+        valid = valid_windows(values, self.len_x)
+        # Window i ends on day i + len_x - 1
+        end_dates = returns.index[self.len_x-1:]
+        first = 0 if start is None else end_dates.searchsorted(pd.Timestamp(start), side='left')
+
+        y_pred = np.full((len(end_dates) - first, len(self.watch_list)), np.nan, dtype=np.float32)
+        positions = np.flatnonzero(valid[first:]) + first
+        for i in range(0, len(positions), batch_size):
+            batch = positions[i:i+batch_size]
+            y_pred[batch - first] = self.model.predict(windows[batch], batch_size=1024, verbose=0)
+        return pd.DataFrame(y_pred, index=end_dates[first:], columns=self.watch_list)
+
+    def get_ensemble_prediction(self, weights=None):
+        """
+        Score the latest window with every registered model. One window is built
+        at the longest input length over the stocks of all models, and each model
+        gets its own last `len_x` days and stocks from it.
         
+        Args:
+            weights (dict, optional): Model name -> weight in the ensemble. If None, all models weigh the same
+            
+        Returns:
+            pd.DataFrame: 'stock' (the watch list of the main model), one prediction and one
+                rank column per model, and the 'ensemble' prediction and rank, best ensemble
+                prediction first. A stock missing from a model is left out of its average
+        """
+        names = list(self.models)
+        if weights is None:
+            weights = {name: 1.0 for name in names}
+        w = np.array([weights.get(name, 0.0) for name in names], dtype=np.float64)
+        if w.sum() == 0:
+            raise ValueError(f"Ensemble weights sum to 0: {weights}")
+
+        specs = self.model_specs
+        stocks = list(dict.fromkeys(s for name in names for s in specs[name]['stocks']))
+        max_len = max(specs[name]['len_x'] for name in names)
+        # One extra day because `get_windows` drops the first window
+        returns = self.data_driver.get_features('returns', stocks, last=max_len + 1)
+        window = get_windows(returns.to_numpy(), len_x=max_len)[-1:]
+        if not len(window):
+            raise ValueError(f"No complete {max_len}-day window of returns for the ensemble stocks")
+
+        columns = {s: i for i, s in enumerate(stocks)}
+        predictions = {}
+        for name in names:
+            spec = specs[name]
+            X = window[:, -spec['len_x']:, [columns[s] for s in spec['stocks']]]
+            y_pred = self.models[name].predict(X, verbose=0)[-1]
+            if len(y_pred) != len(spec['stocks']):
+                raise ValueError(f"Model {name} outputs {len(y_pred)} predictions for "
+                                 f"{len(spec['stocks'])} stocks in its watch list")
+            predictions[name] = pd.Series(y_pred, index=spec['stocks']).reindex(self.watch_list).to_numpy()
+
+        result_df = pd.DataFrame(predictions)
+        values = result_df[names].to_numpy(dtype=np.float64)
+        available = ~np.isnan(values)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result_df["ensemble"] = np.nan_to_num(values) @ w / (available @ w)
+        for name in names + ["ensemble"]:
+            result_df[f"{name}_rank"] = result_df[name].rank(ascending=False, method="first").astype("Int64")
+        result_df.insert(0, "stock", self.watch_list)
+        return result_df.sort_values(by="ensemble", ascending=False)
 
+    @staticmethod
+    def clean_price(df_):
         # Giá trong 1 ngày không thể tăng quá biên độ 10% (HNX 10%, HSX 7%)
         # => Tất cả các thay đổi nhiều hơn khoảng này là do điều chỉnh giá => loại bỏ
         # Gán về thay đổi giá = 0
-        delta_pct_adjusted = np.where( np.abs(delta_pct)<=0.1, delta_pct, 0 )
-
-        i=0
-        for col in df.columns:
-            df[col] = delta_pct_adjusted[:,i]
-            i+=1
-        
-        return (df+1).cumprod()
+        returns = clean_returns(df_)
+        return pd.DataFrame(adjusted_prices(returns), index=df_.index, columns=df_.columns)
 
     @staticmethod
-    def get_X(series, len_x=120, n_stock=22, step=1):
-            """Return a windowed X, y from a timeseries `series`
+    def get_X(series, len_x=120, n_stock=None, step=1):
+            """Return a windowed X from a timeseries `series`
             Args:
                 series: pandas dataframe, shape n_days x m_stock
 
                 # Model params
                 len_x = 120 #day(s)
-                n_stock = 22 #stocks
+                n_stock: unused, windows always cover every column of `series`
                 step  = 1   #day(s)
             Returns:
-                X, y
+                X, shape (n_windows, len_x, m_stock)
             """
             # Data to train is the change percentage of the sotck values
-            to_train = copy.deepcopy(series)
-            to_train = to_train.diff(1)/to_train.shift(1)
+            returns = pct_change(series)
 
-            # print("SHAPE: ", to_train.shape, len_x, n_stock)
-            X_full = view_as_windows(to_train.values, window_shape = (len_x, n_stock), step=step)
-            X_full = np.squeeze(X_full)
-            # Shape: (n_days , len_X, n_stocks)
-
-            n_days = X_full.shape[0]
-
-            # Remove the first 1 rows due to 1 day in diff(1) for the X <br>
-            # and last 30 rows due to 29 day in diff(-30) for the y
-            X = X_full[1:]
-
-            # Remove nan values
-            x_not_null = ~np.isnan(X).any(axis=1).any(axis=1)
+            # Remove the first window due to 1 day in diff(1) and windows with nan values
+            X = sliding_windows(returns, len_x, step=step)[1:]
+            x_not_null = valid_windows(returns, len_x, step=step)[1:]
 
             return X[x_not_null]
 
     def preprocessing(self, data):
-        # Bản chất của các ngày không giao dịch là giá giữ nguyên => sử dụng FFILL để fill NA
-        data_full = data["Close"].ffill()
+        return self.preprocess_close(data["Close"])
 
-        data_full = self.clean_price(data_full)
-        
-        X = self.get_X(data_full, len_x=60, n_stock=data_full.shape[1])
-        return X
+    def preprocess_close(self, close):
+        """
+        Turn close prices into model windows in one NumPy pass: cleaned float32
+        returns, zero-copy sliding windows and an O(n) validity check.
+        """
+        # Bản chất của các ngày không giao dịch là giá giữ nguyên => sử dụng FFILL để fill NA
+        prices = close.ffill().to_numpy(dtype=np.float32)
 
+        # The change percentage of the cleaned, cumulated prices is the cleaned returns
+        returns = clean_returns(prices)
+        return get_windows(returns, len_x=self.len_x)
@@ -0,0 +1,73 @@
+import os
+import threading
+
+class PredictionCache:
+    """
+    Cache of the ranked predictions and their chart, keyed by
+    (model file, feature store version, watch list).
+
+    The features only change on download/refresh, so after a write the cache is
+    recomputed once in a background thread and every request is served from it.
+    The key follows the feature store rather than the stored partitions, so a request
+    racing a refresh cannot store predictions of the old features under the new version.
+    """
+    def __init__(self, predictor):
+        """
+        Args:
+            predictor (Predictor): Predictor used to compute the predictions
+        """
+        self.predictor = predictor
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Serializes computations so a request waits for a running precompute
+        self._compute_lock = threading.Lock()
+        self._thread = None
+
+    def key(self):
+        """
+        Get the cache key of the current model and data.
+        """
+        model_path = self.predictor.model_path
+        model_mtime = os.path.getmtime(model_path) if os.path.exists(model_path) else None
+        feature_version = self.predictor.data_driver.feature_version()
+        return (model_path, model_mtime, feature_version, tuple(self.predictor.watch_list))
+
+    def _compute(self, key):
+        with self._compute_lock:
+            with self._lock:
+                if key in self._entries:
+                    return self._entries[key]
+            result_df = self.predictor.get_prediction()
+            chart = self.predictor.plot_predictions(result_df)
+            with self._lock:
+                # Entries of older data versions are never requested again
+                self._entries = {key: (result_df, chart)}
+            return result_df, chart
+
+    def get(self):
+        """
+        Get the predictions of the current model and data, computing them if needed.
+
+        Returns:
+            tuple: (result_df, chart) where chart is a base64 encoded PNG
+        """
+        key = self.key()
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+        return self._compute(key)
+
+    def refresh_async(self):
+        """
+        Recompute the cache in a background thread, e.g. after the data was refreshed.
+        """
+        def run():
+            try:
+                self._compute(self.key())
+                print("PREDICTION CACHE UPDATED")
+            except Exception as e:
+                print(f"Error precomputing predictions: {str(e)}")
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        return self._thread
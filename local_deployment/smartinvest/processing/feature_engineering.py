@@ -1,41 +1,112 @@
-import copy 
 import numpy as np
-from skimage.util import view_as_windows
+from numpy.lib.stride_tricks import sliding_window_view
 
-def get_X_y(series):
-    """Return a windowed X, y from a timeseries `series`
+# Daily price change limit of the exchanges (HNX 10%, HSX 7%). Larger changes
+# come from price adjustments (dividends, splits) and are set to 0.
+MAX_DAILY_CHANGE = 0.1
+
+def _as_float32(prices):
+    return np.asarray(getattr(prices, 'values', prices), dtype=np.float32)
+
+def pct_change(prices):
+    """Return the day-over-day change percentage of `prices` as float32.
     Args:
-        series: pandas dataframe, shape n_days x m_stock
+        prices: array or dataframe, shape n_days x m_stock
     Returns:
-        X, y
+        returns, shape n_days x m_stock, the first row is NaN
     """
-    # Data to train is the change percentage of the sotck values
-    to_train = copy.deepcopy(series)
-    to_train = to_train.diff(1)/to_train.shift(1)
+    prices = _as_float32(prices)
+    returns = np.empty_like(prices)
+    returns[0] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(prices[1:], prices[:-1], out=returns[1:])
+    returns[1:] -= 1
+    return returns
 
-    target_30d = copy.deepcopy(series)
-    target_30d = -target_30d.diff(-30)/target_30d
+def clean_returns(prices, max_change=MAX_DAILY_CHANGE):
+    """Return the change percentage of `prices` with price adjustments removed.
+    Changes larger than `max_change` and missing changes are set to 0, in place.
+    Args:
+        prices: array or dataframe, shape n_days x m_stock
+    Returns:
+        returns, shape n_days x m_stock, the first row is NaN
+    """
+    returns = pct_change(prices)
+    body = returns[1:]
+    with np.errstate(invalid='ignore'):
+        body[~(np.abs(body) <= max_change)] = 0
+    return returns
 
-    # Model params
-    len_x = 120 #day(s)
-    n_stock = 22 #stocks
-    step  = 1   #day(s)
+def adjusted_prices(returns):
+    """Return the cumulative price index (starting at 1) of cleaned `returns`."""
+    returns = np.nan_to_num(returns, nan=0.0)
+    return np.cumprod(returns + 1, axis=0)
 
-    X_full = view_as_windows(to_train.values, window_shape = (len_x, n_stock), step=step)
-    X_full = np.squeeze(X_full)
-    # Shape: (n_days , len_X, n_stocks)
+def forward_returns(prices, horizon=30):
+    """Return the change percentage from each day to `horizon` days later.
+    Returns:
+        targets, shape n_days x m_stock, the last `horizon` rows are NaN
+    """
+    prices = _as_float32(prices)
+    targets = np.full_like(prices, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        targets[:len(prices)-horizon] = prices[horizon:] / prices[:len(prices)-horizon] - 1
+    return targets
 
-    n_days = X_full.shape[0]
+def sliding_windows(values, len_x, step=1):
+    """Return a zero-copy view of all windows of `len_x` days.
+    Returns:
+        windows, shape (n_days - len_x + 1, len_x, m_stock), no window if n_days < len_x
+    """
+    values = np.asarray(values)
+    if len(values) < len_x:
+        return np.empty((0, len_x) + values.shape[1:], dtype=values.dtype)
+    windows = sliding_window_view(values, len_x, axis=0).transpose(0, 2, 1)
+    return windows[::step]
 
-    # Remove the first 1 rows due to 1 day in diff(1) for the X <br>
-    # and last 30 rows due to 29 day in diff(-30) for the y
-    X = X_full[1:-30]
-    y = target_30d.values[len_x:-30]
+def valid_windows(values, len_x, step=1):
+    """Return which windows of `len_x` days contain no NaN, in O(n_days).
+    The NaN count of each window comes from a cumulative sum of NaN rows
+    instead of scanning every window.
+    """
+    nan_rows = np.isnan(values).any(axis=1)
+    nan_count = np.concatenate([[0], np.cumsum(nan_rows)])
+    window_nans = nan_count[len_x:] - nan_count[:-len_x]
+    return (window_nans == 0)[::step]
 
-    # Remove nan values
-    x_not_null = ~np.isnan(X).any(axis=1).any(axis=1)
-    y_not_null = ~np.isnan(y).any(axis=1)
+def get_X(returns, len_x=120):
+    """Return the valid model windows of a returns array.
+    The first window is dropped because the first row of the returns is NaN.
+    Returns:
+        X, shape (n_windows, len_x, m_stock)
+    """
+    windows = sliding_windows(returns, len_x)[1:]
+    valid = valid_windows(returns, len_x)[1:]
+    return windows[valid]
+
+def get_X_y(series, len_x=120, horizon=30):
+    """Return a windowed X, y from a timeseries `series`
+    Args:
+        series: pandas dataframe, shape n_days x m_stock
+        len_x: number of days in a window
+        horizon: number of days ahead of the window end the target is measured
+    Returns:
+        X, y
+    """
+    # Data to train is the change percentage of the stock values
+    returns = pct_change(series)
+    targets = forward_returns(series, horizon)
+
+    # Remove the first window due to 1 day in diff(1) for the X
+    # and the last `horizon` windows which have no target
+    n_windows = len(returns) - len_x - horizon
+    if n_windows <= 0:
+        return (np.empty((0, len_x, returns.shape[1]), dtype=np.float32),
+                np.empty((0, returns.shape[1]), dtype=np.float32))
+    X = sliding_windows(returns, len_x)[1:n_windows+1]
+    y = targets[len_x:len_x+n_windows]
 
-    not_null = x_not_null & y_not_null
+    # Remove nan values
+    not_null = valid_windows(returns, len_x)[1:n_windows+1] & ~np.isnan(y).any(axis=1)
 
-    return X[not_null], y[not_null]
\ No newline at end of file
+    return X[not_null], y[not_null]
@@ -0,0 +1,28 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+def share_array(array, dtype=np.float32):
+    """
+    Copy an array into a new shared memory block, e.g. once before starting a process pool.
+
+    The caller owns the block and must `close()` and `unlink()` it when the pool is done.
+
+    Returns:
+        tuple: (SharedMemory, spec) where spec lets other processes map the array with `attach_array`
+    """
+    array = np.ascontiguousarray(array, dtype=dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+def attach_array(spec):
+    """
+    Map an array shared by `share_array` without copying it.
+
+    Returns:
+        tuple: (SharedMemory, array). Keep a reference to the block, the array
+            is only valid while it is open
+    """
+    shm_name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=shm_name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
@@ -0,0 +1,165 @@
+import queue
+import threading
+import numpy as np
+import pandas as pd
+
+from .feature_engineering import valid_windows
+
+class WindowDataset:
+    """
+    Shuffled mini-batches of (window, target) pairs read on demand from a
+    days x stocks returns matrix, usually memory-mapped from the feature store.
+
+    Only the start row of every valid window is kept in memory. A batch is
+    gathered from the matrix when it is requested, so memory does not grow
+    with the number of stocks and years like the dense X of `get_X_y`.
+    """
+    def __init__(self, returns, targets, dates=None, len_x=120, horizon=30, start=None, end=None,
+                 batch_size=128, shuffle=True, seed=None, prefetch=2):
+        """
+        Args:
+            returns (np.ndarray): Returns, shape n_days x m_stock
+            targets (np.ndarray): Forward returns of each day, shape n_days x m_stock
+            dates (pd.DatetimeIndex, optional): Dates of the rows, needed to split by `start`/`end`
+            len_x (int): Number of days in a window
+            horizon (int): Number of days ahead of the window end the target is measured
+            start (str, optional): First date of the windows
+            end (str, optional): Last date used by the windows and their targets, so
+                nothing after `end` leaks into the split
+            batch_size (int): Number of windows per batch
+            shuffle (bool): Whether to shuffle the windows at every epoch
+            seed (int, optional): Seed of the shuffling
+            prefetch (int): Number of batches prepared ahead in a background thread, 0 disables it
+        """
+        self.returns = returns
+        self.targets = targets
+        self.len_x = len_x
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.prefetch = prefetch
+        self._rng = np.random.default_rng(seed)
+        self._offsets = np.arange(len_x)
+        # Stop signals of the running prefetch threads, set by `close`
+        self._producers = set()
+        self._producers_lock = threading.Lock()
+
+        # Window starting at row s covers rows [s, s + len_x) and targets row s + len_x - 1
+        row_start, row_end = 0, len(returns)
+        if dates is not None:
+            if start is not None:
+                row_start = dates.searchsorted(pd.Timestamp(start), side='left')
+            if end is not None:
+                row_end = dates.searchsorted(pd.Timestamp(end), side='right')
+        starts = np.arange(max(len(returns) - len_x + 1, 0))
+        valid = valid_windows(np.asarray(returns), len_x)
+        valid &= ~np.isnan(targets[len_x-1:]).any(axis=1)
+        # The target is known `horizon` days after the window end
+        valid &= (starts >= row_start) & (starts + len_x - 1 + horizon < row_end)
+        self.starts = starts[valid]
+
+    @classmethod
+    def from_features(cls, data_driver, stocks=None, **kwargs):
+        """
+        Build a dataset over the returns and targets of the feature store of a DataDriver.
+        """
+        returns = data_driver.get_features('returns', stocks)
+        targets = data_driver.get_features('targets', stocks)
+        kwargs.setdefault('horizon', data_driver.feature_store.horizon)
+        return cls(returns.to_numpy(), targets.to_numpy(), returns.index, **kwargs)
+
+    def __len__(self):
+        return -(-len(self.starts) // self.batch_size)
+
+    @property
+    def n_windows(self):
+        return len(self.starts)
+
+    def get_batch(self, starts):
+        """
+        Gather the windows starting at `starts` and their targets.
+
+        Returns:
+            tuple: X of shape (n, len_x, m_stock) and y of shape (n, m_stock), float32
+        """
+        starts = np.sort(starts)  # Sorted rows read the memmap sequentially
+        X = np.asarray(self.returns[starts[:, None] + self._offsets], dtype=np.float32)
+        y = np.asarray(self.targets[starts + self.len_x - 1], dtype=np.float32)
+        return X, y
+
+    def _batches(self):
+        order = self._rng.permutation(self.starts) if self.shuffle else self.starts
+        for i in range(0, len(order), self.batch_size):
+            yield self.get_batch(order[i:i+self.batch_size])
+
+    def __iter__(self):
+        """
+        Iterate once over all windows (one epoch).
+
+        The prefetch thread stops when the iteration ends, when the iterator is
+        closed or garbage collected, or when `close` is called.
+        """
+        if not self.prefetch:
+            yield from self._batches()
+            return
+
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            # Wake up regularly so a consumer that went away does not block the thread forever
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for batch in self._batches():
+                    if not put(batch):
+                        return
+            except Exception as e:
+                put(e)
+            put(done)
+
+        with self._producers_lock:
+            self._producers.add(stop)
+        threading.Thread(target=produce, name='WindowDataset-prefetch', daemon=True).start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is done:
+                    return
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            stop.set()
+            with self._producers_lock:
+                self._producers.discard(stop)
+
+    def close(self):
+        """
+        Stop the prefetch threads of every open iterator, e.g. once Keras `fit`
+        returns and stops pulling from `repeat()`.
+        """
+        with self._producers_lock:
+            producers, self._producers = self._producers, set()
+        for stop in producers:
+            stop.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def repeat(self):
+        """
+        Iterate over the epochs forever, for Keras `fit` with `steps_per_epoch=len(dataset)`.
+        """
+        while True:
+            yield from self
@@ -0,0 +1,113 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+# positions: dates x tickers weights held over each day
+# returns, turnover, equity: one value per date
+BacktestResult = namedtuple('BacktestResult', ['positions', 'returns', 'turnover', 'equity', 'stats'])
+
+def signal_weights(signals, top_k=10, long_short=False):
+    """
+    Turn a signal matrix into target weights with array operations.
+
+    Args:
+        signals (np.ndarray): Signals, shape n_days x m_stock, NaN where a stock has no signal
+        top_k (int, optional): Number of stocks held, equally weighted, on each side.
+            If None, weights are proportional to the positive signals
+        long_short (bool): If True, also shorts the `top_k` lowest signals
+
+    Returns:
+        np.ndarray: Weights, shape n_days x m_stock, gross exposure of 1 per side
+    """
+    signals = np.asarray(signals, dtype=np.float64)
+    valid = ~np.isnan(signals)
+    weights = np.zeros_like(signals)
+
+    if top_k is None:
+        positive = np.where(valid & (signals > 0), signals, 0.0)
+        total = positive.sum(axis=1, keepdims=True)
+        np.divide(positive, total, out=weights, where=total > 0)
+        return weights
+
+    n_valid = valid.sum(axis=1)
+    k = np.minimum(top_k, n_valid)
+    ranks = np.arange(signals.shape[1])
+    # Stocks without signal are sorted last on both sides
+    order = np.argsort(np.where(valid, -signals, np.inf), axis=1)
+    longs = ranks[None, :] < k[:, None]
+    np.put_along_axis(weights, order, longs / np.maximum(k, 1)[:, None], axis=1)
+    if long_short:
+        order = np.argsort(np.where(valid, signals, np.inf), axis=1)
+        # With fewer than 2 * top_k signals, the stocks left after the longs are shorted
+        n_short = np.minimum(k, n_valid - k)
+        shorts = ranks[None, :] < n_short[:, None]
+        short_weights = np.zeros_like(signals)
+        np.put_along_axis(short_weights, order, shorts / np.maximum(n_short, 1)[:, None], axis=1)
+        weights -= short_weights
+    return weights
+
+def backtest(signals, returns, top_k=10, long_short=False, rebalance=1, lag=1, cost=0.0):
+    """
+    Vectorized backtest of a signal matrix.
+
+    Positions decided with the signals of day t are held from day t + `lag` on
+    and changed every `rebalance` days. The daily return of the portfolio is the
+    position-weighted return of the stocks, minus `cost` times the turnover.
+
+    Args:
+        signals (pd.DataFrame): Signals (e.g. model predictions), dates x tickers
+        returns (pd.DataFrame): Daily returns of the stocks, e.g. the feature store 'returns'
+        top_k (int, optional): Number of stocks held per side, see `signal_weights`
+        long_short (bool): If True, also shorts the lowest signals
+        rebalance (int): Number of days between two rebalances
+        lag (int): Days between a signal and the first return it trades
+        cost (float): Trading cost per unit of turnover, e.g. 0.0015 for 0.15%
+
+    Returns:
+        BacktestResult: Positions, daily returns, turnover, equity curve and summary stats
+    """
+    signals = signals.reindex(index=returns.index, columns=returns.columns)
+    weights = signal_weights(signals.to_numpy(), top_k=top_k, long_short=long_short)
+
+    # Hold the weights of the last rebalance day
+    n_days = len(weights)
+    held = weights[(np.arange(n_days) // rebalance) * rebalance]
+    positions = np.zeros_like(held)
+    positions[lag:] = held[:n_days-lag]
+
+    turnover = np.abs(np.diff(positions, axis=0, prepend=0.0)).sum(axis=1)
+    stock_returns = np.nan_to_num(returns.to_numpy(dtype=np.float64), nan=0.0)
+    daily = (positions * stock_returns).sum(axis=1) - cost * turnover
+    equity = np.cumprod(1 + daily)
+
+    index = returns.index
+    return BacktestResult(
+        positions=pd.DataFrame(positions, index=index, columns=returns.columns),
+        returns=pd.Series(daily, index=index, name='returns'),
+        turnover=pd.Series(turnover, index=index, name='turnover'),
+        equity=pd.Series(equity, index=index, name='equity'),
+        stats=summarize(daily, equity, turnover),
+    )
+
+def summarize(daily, equity, turnover):
+    """
+    Summary statistics of a backtest.
+
+    Returns:
+        dict: total_return, annual_return, annual_volatility, sharpe, max_drawdown, mean_turnover
+    """
+    if len(daily) == 0:
+        return {}
+    years = len(daily) / TRADING_DAYS
+    volatility = float(np.std(daily) * np.sqrt(TRADING_DAYS))
+    drawdown = equity / np.maximum.accumulate(np.maximum(equity, 1.0)) - 1
+    return {
+        'total_return': float(equity[-1] - 1),
+        'annual_return': float(equity[-1] ** (1 / years) - 1) if equity[-1] > 0 else -1.0,
+        'annual_volatility': volatility,
+        'sharpe': float(np.mean(daily) * TRADING_DAYS / volatility) if volatility > 0 else 0.0,
+        'max_drawdown': float(drawdown.min()),
+        'mean_turnover': float(np.mean(turnover)),
+    }
@@ -0,0 +1,75 @@
+import time
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from .simulator import Simulator
+from ..processing.shared_arrays import share_array, attach_array
+
+# name: label of the strategy in the results
+# make_actor: module-level function returning an Actor, called in the worker as make_actor(**params)
+# params: keyword arguments of make_actor
+Strategy = namedtuple('Strategy', ['name', 'make_actor', 'params'])
+
+# Data of the batch mapped from shared memory in each worker, set by `_attach`
+_shared = {}
+
+def _attach(spec, index, columns):
+    """
+    Worker initializer: map the shared data once as a DataFrame, without copying it.
+    """
+    _shared['shm'], values = attach_array(spec)
+    _shared['data'] = pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+def _run_strategy(strategy):
+    start = time.perf_counter()
+    actor = strategy.make_actor(**(strategy.params or {}))
+    returns, portfolio = Simulator(_shared['data'], actor).simulate()
+    return returns, portfolio, time.perf_counter() - start
+
+def run_strategies(data, strategies, n_workers=None, mp_context='spawn'):
+    """
+    Simulate many strategies over the same data in a process pool.
+
+    The data is copied once into shared memory and every worker maps it, so the
+    dataset is not duplicated per process or pickled per strategy.
+
+    Args:
+        data (pd.DataFrame): Numeric data to simulate (e.g. close prices or returns), dates x tickers
+        strategies (list): Strategy tuples, with unique names
+        n_workers (int, optional): Number of processes. If None, uses the number of CPUs
+        mp_context (str): Start method of the processes
+
+    Returns:
+        tuple: (results, timings)
+            results (pd.DataFrame): One row per date, ('returns', 'portfolio') columns per strategy
+            timings (pd.Series): Seconds taken by each strategy
+    """
+    names = [s.name for s in strategies]
+    if len(set(names)) != len(names):
+        raise ValueError("Strategy names must be unique")
+
+    shm, spec = share_array(data.to_numpy())
+    try:
+        series, timings = {}, {}
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context(mp_context),
+                                 initializer=_attach, initargs=(spec, data.index, data.columns)) as pool:
+            futures = {pool.submit(_run_strategy, strategy): strategy.name for strategy in strategies}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    returns, portfolio, seconds = future.result()
+                except Exception as e:
+                    print(f"STRATEGY FAILED {name}: {str(e)}")
+                    continue
+                series[name] = pd.DataFrame({'returns': returns, 'portfolio': portfolio}, index=data.index)
+                timings[name] = seconds
+                print(f"STRATEGY DONE {name} in {seconds:.2f}s")
+    finally:
+        shm.close()
+        shm.unlink()
+
+    done = [name for name in names if name in series]
+    results = pd.concat({name: series[name] for name in done}, axis=1) if done else pd.DataFrame(index=data.index)
+    return results, pd.Series(timings, name='seconds').reindex(done)
@@ -0,0 +1,58 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+SIGNALS_FOLDER = 'signals'
+
+def signals_key(predictor, start=None, end=None):
+    """
+    Get the cache key of the signals of a predictor: model file, feature store
+    version, stocks, window length and period.
+    """
+    model_path = predictor.model_path
+    model_mtime = os.path.getmtime(model_path) if os.path.exists(model_path) else None
+    return {
+        'model_path': model_path,
+        'model_mtime': model_mtime,
+        'backend': predictor.backend,
+        'feature_version': predictor.data_driver.feature_version(),
+        'stocks': list(predictor.watch_list),
+        'len_x': predictor.len_x,
+        'start': start,
+        'end': end,
+    }
+
+def precompute_signals(predictor, start=None, end=None, cache_folder=None):
+    """
+    Score every rolling window of the period with batched model calls, caching
+    the signals on disk so later backtests of the same model and data reuse them.
+
+    Args:
+        predictor (Predictor): Model and data to score
+        start (str, optional): First signal date
+        end (str, optional): Last signal date
+        cache_folder (str, optional): Folder of the cached signals. If None, uses data/signals
+
+    Returns:
+        pd.DataFrame: Signals indexed by date, one column per stock
+    """
+    if cache_folder is None:
+        cache_folder = os.path.join(predictor.data_driver.data_folder, SIGNALS_FOLDER)
+    key = signals_key(predictor, start, end)
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    path = os.path.join(cache_folder, f"signals_{digest}.parquet")
+
+    if os.path.exists(path):
+        print(f"SIGNALS LOADED FROM CACHE: {path}")
+        return pd.read_parquet(path)
+
+    signals = predictor.get_predictions(start=start, end=end)
+    os.makedirs(cache_folder, exist_ok=True)
+    tmp_path = path + '.tmp'
+    signals.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+    with open(os.path.splitext(path)[0] + '.json', 'w') as f:
+        json.dump(key, f, indent=1, default=str)
+    print(f"SIGNALS SAVED TO CACHE: {path}")
+    return signals
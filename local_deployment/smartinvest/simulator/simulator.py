@@ -1,4 +1,7 @@
+import numpy as np
 import pandas as pd
+from .backtest import backtest
+from ..processing.feature_engineering import clean_returns
 
 class Simulator:
     def __init__(self, data, actor):
@@ -12,15 +15,26 @@ class Simulator:
         self.actor = actor
     
 
-    def simulate(self):
+    def simulate(self, signals=None):
         """
         Simulate the stock market with a given actor and model
+        Args:
+            signals: pd.DataFrame, optional: precomputed model predictions, dates x tickers
+                (see signals.precompute_signals). If given, the event loop replays them as
+                the actions instead of calling the model once per day. Days without a
+                signal get a NaN action
         """
+        if signals is not None:
+            # Plain arrays: no per-row pandas indexing in the loop
+            actions = signals.reindex(self.data.index).to_numpy()
+
         returns = []
         portfolio = []
         for i in range(len(self.data)):
-            data = self.data.iloc[i]
-            action = self.actor.get_action(data)
+            if signals is not None:
+                action = actions[i]
+            else:
+                action = self.actor.get_action(self.data.iloc[i])
             self.actor.update_portfolio(action)
 
             returns.append( self.actor.get_current_returns() )
@@ -28,33 +42,103 @@ class Simulator:
 
         return returns, portfolio
 
+    def backtest(self, signals, returns=None, **kwargs):
+        """
+        Vectorized mode: backtest a precomputed signal matrix in bulk instead of
+        stepping the actor through every row.
+
+        Args:
+            signals (pd.DataFrame): Signals (e.g. model predictions), dates x tickers
+            returns (pd.DataFrame, optional): Daily returns, e.g. DataDriver.get_features('returns').
+                If None, uses the cleaned returns of `data` (close prices, dates x tickers)
+            **kwargs: Options of `backtest.backtest` (top_k, long_short, rebalance, lag, cost)
+
+        Returns:
+            BacktestResult: Positions, daily returns, turnover, equity curve and summary stats
+        """
+        if returns is None:
+            prices = self.data.ffill()
+            returns = pd.DataFrame(clean_returns(prices), index=prices.index, columns=prices.columns)
+        return backtest(signals, returns, **kwargs)
+
     def get_portfolio(self):
         """
         Get the portfolio of the actor
         """
         return self.actor.get_portfolio()
         
+class RingBuffer:
+    """
+    Fixed-size history of the last `size` rows, preallocated once.
+
+    Every row is written twice, at `i` and `i + size`, so the last `size` rows
+    are always one contiguous slice and `window()` is a view, never a copy.
+    """
+    def __init__(self, size, n_columns, dtype=np.float32):
+        """
+        Args:
+            size (int): Number of rows kept
+            n_columns (int): Number of values per row
+        """
+        self.size = size
+        self._buffer = np.full((2 * size, n_columns), np.nan, dtype=dtype)
+        self._next = 0
+        self.count = 0
+
+    def append(self, row):
+        self._buffer[self._next] = row
+        self._buffer[self._next + self.size] = row
+        self._next = (self._next + 1) % self.size
+        self.count += 1
+
+    def window(self):
+        """
+        Get the last rows, oldest first, as a read-only view of shape (min(count, size), n_columns).
+        """
+        n = min(self.count, self.size)
+        # The row after the newest one (mod size) is the oldest one kept
+        end = self._next + self.size
+        view = self._buffer[end - n:end]
+        view.flags.writeable = False
+        return view
+
 class Actor:
     def __init__(self, model, window_size=10):
         """
         Decision making and portfolio management
         Args:
             model: Model: model which will make investment decision
+            window_size: int: number of past days given to the model (its lookback)
         """
         self.model = model
-        self.historical_data = pd.DataFrame()
+        self.window_size = window_size
+        self.columns = None
+        self.history = None
+
+    @property
+    def historical_data(self):
+        """
+        The last `window_size` days as a DataFrame over the history buffer.
+        """
+        if self.history is None:
+            return pd.DataFrame()
+        return pd.DataFrame(self.history.window(), columns=self.columns, copy=False)
 
     def get_action(self, data=None):
         if data is not None:
-            self.historical_data = pd.concat([self.historical_data, pd.DataFrame([data])])
-        
-        w
-            
-        return self.model.predict(self.historical_data)
+            if self.history is None:
+                # The buffer is sized from the first row, then reused every step
+                self.columns = list(data.index)
+                self.history = RingBuffer(self.window_size, len(self.columns))
+            self.history.append(data.to_numpy(dtype=np.float32))
+
+        return self.model.predict(self.history.window())
+
+    def update_portfolio(self, action):
+        return self.model.update_portfolio(action)
 
     def get_current_returns(self):
         return self.model.get_current_returns()
 
     def get_current_portfolio(self):
         return self.model.get_current_portfolio()
-
@@ -0,0 +1,69 @@
+import os
+import glob
+import json
+import threading
+import numpy as np
+import pandas as pd
+
+from smartinvest.datadriver.close_matrix import CloseMatrix
+
+def close_prices(n_days, stocks=('A', 'B', 'C')):
+    index = pd.bdate_range('2024-01-01', periods=n_days)
+    values = np.arange(n_days * len(stocks), dtype=np.float32).reshape(n_days, len(stocks))
+    return pd.DataFrame(values, index=index, columns=list(stocks))
+
+def test_update_merges_and_keeps_one_values_file(tmp_path):
+    matrix = CloseMatrix(str(tmp_path))
+    matrix.update(close_prices(10))
+    matrix.update(close_prices(15).iloc[10:] + 1000)
+
+    close = matrix.get()
+    assert close.shape == (15, 3)
+    np.testing.assert_array_equal(close.iloc[:10].to_numpy(), close_prices(10).to_numpy())
+    assert close.iloc[-1, 0] == close_prices(15).iloc[-1, 0] + 1000
+    assert len(glob.glob(os.path.join(tmp_path, 'close_matrix*.f32'))) == 1
+
+def test_reads_matrix_without_values_file_name(tmp_path):
+    # Matrices written before the index named its values file
+    close = close_prices(5)
+    close.to_numpy().tofile(os.path.join(tmp_path, 'close_matrix.f32'))
+    with open(os.path.join(tmp_path, 'close_matrix.json'), 'w') as f:
+        json.dump({'dates': close.index.strftime('%Y-%m-%d').tolist(), 'stocks': ['A', 'B', 'C']}, f)
+    np.testing.assert_array_equal(CloseMatrix(str(tmp_path)).get().to_numpy(), close.to_numpy())
+
+def test_concurrent_writes_and_reads(tmp_path):
+    errors = []
+    stop = threading.Event()
+
+    def write(n_days):
+        try:
+            for _ in range(20):
+                CloseMatrix(str(tmp_path)).write(close_prices(n_days))
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        matrix = CloseMatrix(str(tmp_path))
+        while not stop.is_set():
+            try:
+                close = matrix.get()
+                # Values are always mapped with the shape of their own index
+                expected = close_prices(len(close)).to_numpy()
+                np.testing.assert_array_equal(close.to_numpy(), expected)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    CloseMatrix(str(tmp_path)).write(close_prices(5))
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    writers = [threading.Thread(target=write, args=(n_days,)) for n_days in (10, 50, 200)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert not errors
+    assert len(glob.glob(os.path.join(tmp_path, '*.tmp'))) == 0
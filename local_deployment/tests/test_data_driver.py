@@ -0,0 +1,109 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+
+from smartinvest.datadriver.cache import ReadCache
+from smartinvest.datadriver.data_driver import DataDriver
+from smartinvest.datadriver.downloader import FrameFetcher
+from smartinvest.datadriver.storage import write_partition
+
+STOCKS = ['AAA', 'BBB', 'CCC']
+
+def make_partition(year, seed, n_days=60):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(f'{year}-01-02', periods=n_days, name='time')
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.02, n_days))
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                         'Volume': rng.integers(1_000, 100_000, n_days)}, index=index)
+
+@pytest.fixture
+def data_folder(tmp_path):
+    for i, stock in enumerate(STOCKS):
+        for year in (2023, 2024):
+            write_partition(make_partition(year, 10 * i + year), os.path.join(tmp_path, stock, str(year)),
+                            f'{year}0101000000')
+    return str(tmp_path)
+
+def test_warm_up_builds_close_matrix_and_features(data_folder):
+    data_driver = DataDriver(data_folder, cache_bytes=None)
+    data_driver.warm_up()
+    assert sorted(data_driver.close_matrix.stocks) == STOCKS
+    assert data_driver.feature_version()[1] == '2024-03-25'
+    # Nothing left to compute
+    assert data_driver.update_features() == 0
+
+def test_concurrent_first_reads(data_folder):
+    errors = []
+
+    def read(method, *args, **kwargs):
+        try:
+            getattr(DataDriver(data_folder, cache_bytes=None), method)(*args, **kwargs)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read, args=('get_features', 'returns', STOCKS), kwargs={'last': 10}),
+               threading.Thread(target=read, args=('get_close_prices', STOCKS)),
+               threading.Thread(target=read, args=('get_features', 'targets', STOCKS[:2]))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    data_driver = DataDriver(data_folder, cache_bytes=None)
+    assert len(data_driver.get_features('returns', STOCKS)) == 120
+
+def test_read_cache_invalidated_by_writes(data_folder):
+    data_driver = DataDriver(data_folder)
+    first = data_driver.read_stocks_years(STOCKS, [2023, 2024], columns=['Close'])
+    assert data_driver.read_stocks_years(STOCKS, [2023, 2024], columns=['Close']) is first
+    assert data_driver.cache_stats()['hits'] == 1
+
+    # A new snapshot of one partition changes its manifest version
+    revised = make_partition(2024, 0) * 2
+    write_partition(revised, os.path.join(data_folder, 'AAA', '2024'), '20240401000000')
+    second = data_driver.read_stocks_years(STOCKS, [2023, 2024], columns=['Close'])
+    assert second is not first
+    assert data_driver.cache_stats()['misses'] == 2
+    # Partitions of the other years are still served from their own entries
+    assert data_driver.read_stocks_years(['AAA'], [2023]) is data_driver.read_stocks_years(['AAA'], [2023])
+
+def test_read_cache_evicts_least_recently_used():
+    cache = ReadCache(max_bytes=2 * 800)
+    for key in 'abc':
+        if key == 'c':
+            assert cache.get('a', 1) is not None
+        cache.put(key, 1, np.zeros(100))
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) is not None and cache.get('c', 1) is not None
+    assert cache.stats()['evictions'] == 1
+    # Another version of the data is a miss, and drops the stale entry
+    assert cache.get('a', 2) is None
+    assert cache.stats()['entries'] == 1
+
+def test_refresh_downloads_only_new_days(data_folder):
+    frames = {stock: make_partition(2024, 10 * i + 2024, n_days=80) for i, stock in enumerate(STOCKS)}
+    requests = []
+    fetcher = FrameFetcher(frames)
+
+    def recording_fetcher(stock, start_date, end_date):
+        requests.append((stock, start_date))
+        return fetcher(stock, start_date, end_date)
+
+    data_driver = DataDriver(data_folder, fetcher=recording_fetcher, cache_bytes=None)
+    data_driver.warm_up()
+    results = data_driver.refresh_database(end_date='2024-04-30')
+
+    assert sorted(requests) == [(stock, '2024-03-26') for stock in STOCKS]
+    assert all(result.status == 'ok' and result.rows == 20 for result in results.values())
+    close = data_driver.get_close_prices(STOCKS)
+    assert len(close) == 140
+    np.testing.assert_allclose(close['BBB'].loc['2024'], frames['BBB']['Close'], rtol=1e-6)
+    # The features follow the refreshed close matrix
+    assert data_driver.feature_version()[1] == '2024-04-22'
+
+    requests.clear()
+    assert data_driver.refresh_database(end_date='2024-04-22') == {}
+    assert requests == []
@@ -0,0 +1,70 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+from smartinvest.predictor import prediction
+from smartinvest.predictor.prediction import Predictor, WATCH_LIST, latest_model_path
+
+MODEL_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'smartinvest', 'model')
+
+class FakeDataDriver:
+    def __init__(self, n_days=400, seed=0):
+        rng = np.random.default_rng(seed)
+        index = pd.bdate_range('2023-01-02', periods=n_days)
+        self.returns = pd.DataFrame(rng.normal(0, 0.02, (n_days, len(WATCH_LIST))).astype(np.float32),
+                                    index=index, columns=WATCH_LIST)
+
+    def get_features(self, name, stocks, start=None, end=None, last=None):
+        return self.returns[list(stocks)].iloc[-last:]
+
+class LastDayModel:
+    """Predicts the return of the last day of its window, and checks the window length."""
+    def __init__(self, len_x, n_outputs=None):
+        self.input_shape = (None, len_x, len(WATCH_LIST))
+        self.n_outputs = n_outputs
+
+    def predict(self, X, verbose=0):
+        assert X.shape[1:] == self.input_shape[1:]
+        return X[:, -1, :self.n_outputs]
+
+def make_predictor(monkeypatch, models):
+    monkeypatch.setattr(prediction, 'load_model', lambda path, backend: models[path])
+    return Predictor(FakeDataDriver(), model_path='a.keras', backend='numpy', model_paths=list(models)[1:])
+
+def test_ensemble_windows_per_model(monkeypatch):
+    predictor = make_predictor(monkeypatch, {'a.keras': LastDayModel(60), 'b.h5': LastDayModel(180)})
+    assert predictor.len_x == 60
+    assert predictor.model_specs['b']['len_x'] == 180
+
+    result = predictor.get_ensemble_prediction(weights={'a': 1.0, 'b': 3.0}).set_index('stock')
+    last_day = predictor.data_driver.returns.iloc[-1]
+    np.testing.assert_allclose(result['a'], last_day[result.index], rtol=1e-6)
+    np.testing.assert_allclose(result['ensemble'], last_day[result.index], rtol=1e-6)
+
+def test_ensemble_rejects_bad_models_and_weights(monkeypatch):
+    predictor = make_predictor(monkeypatch, {'a.keras': LastDayModel(60), 'b.h5': LastDayModel(60, n_outputs=10)})
+    with pytest.raises(ValueError, match="outputs 10 predictions"):
+        predictor.get_ensemble_prediction()
+    with pytest.raises(ValueError, match="sum to 0"):
+        predictor.get_ensemble_prediction(weights={'c': 1.0})
+
+def test_ensemble_of_shipped_models(tmp_path):
+    pytest.importorskip('tensorflow')
+    paths = []
+    for model_file in ['exp_1.4_20250518.keras', 'exp_1.4_20240715.h5']:
+        shutil.copy(os.path.join(MODEL_FOLDER, model_file), tmp_path)
+        paths.append(str(tmp_path / model_file))
+
+    predictor = Predictor(FakeDataDriver(), model_path=paths[0], backend='numpy', model_paths=paths[1:])
+    assert [spec['len_x'] for spec in predictor.model_specs.values()] == [60, 180]
+    result = predictor.get_ensemble_prediction()
+    assert len(result) == len(WATCH_LIST)
+    assert result['ensemble'].notna().all()
+
+def test_latest_model_path(tmp_path):
+    assert latest_model_path(str(tmp_path)) is None
+    for name in ['wf_20240102_20240301120000', 'wf_20240301_20240401120000', 'wf_20240301_20240501120000']:
+        (tmp_path / f'{name}.keras').touch()
+    assert latest_model_path(str(tmp_path)).endswith('wf_20240301_20240501120000.keras')
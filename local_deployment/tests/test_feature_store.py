@@ -0,0 +1,74 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+
+from smartinvest.datadriver.feature_store import FeatureStore, FEATURE_NAMES
+
+HORIZON = 5
+
+def close_prices(n_days=160, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2023-01-02', periods=n_days)
+    close = pd.DataFrame(100 * np.cumprod(1 + rng.normal(0, 0.02, (n_days, 4)), axis=0),
+                         index=index, columns=['A', 'B', 'C', 'D']).astype(np.float32)
+    # C is listed late, D misses a few sessions
+    close.iloc[:40, 2] = np.nan
+    close.iloc[[70, 71, 130], 3] = np.nan
+    return close
+
+def assert_same_features(store, expected):
+    for name in FEATURE_NAMES:
+        np.testing.assert_allclose(store.get(name).to_numpy(), expected.get(name).to_numpy(),
+                                   rtol=1e-5, atol=1e-6, err_msg=name)
+
+def rebuilt(tmp_path, close):
+    store = FeatureStore(str(tmp_path / 'rebuilt'), horizon=HORIZON)
+    store.update(close)
+    return store
+
+@pytest.mark.parametrize('n_old', [60, 155])
+def test_incremental_update_matches_rebuild(tmp_path, n_old):
+    close = close_prices()
+    store = FeatureStore(str(tmp_path / 'incremental'), horizon=HORIZON)
+    assert store.update(close.iloc[:n_old]) == n_old
+    assert store.update(close) == len(close) - n_old
+    assert store.update(close) == 0
+
+    assert store.last_date() == close.index[-1].strftime('%Y-%m-%d')
+    assert_same_features(store, rebuilt(tmp_path, close))
+
+def test_revised_history_triggers_rebuild(tmp_path):
+    close = close_prices()
+    store = FeatureStore(str(tmp_path / 'incremental'), horizon=HORIZON)
+    store.update(close.iloc[:100])
+    version = store.version()
+
+    # A price deep in the stored history is revised, e.g. by a re-download
+    close.iloc[10, 0] *= 1.1
+    assert store.update(close) == len(close)
+    assert store.version() != version
+    assert_same_features(store, rebuilt(tmp_path, close))
+
+def test_concurrent_updates_leave_a_consistent_store(tmp_path):
+    close = close_prices()
+    store_path = str(tmp_path / 'concurrent')
+    errors = []
+
+    def update(n_days):
+        try:
+            FeatureStore(store_path, horizon=HORIZON).update(close.iloc[:n_days])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=update, args=(n_days,)) for n_days in (60, 100, 130, 160) * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    store = FeatureStore(store_path, horizon=HORIZON)
+    n_days = store._state()['n_days']
+    assert all(len(store.get(name)) == n_days for name in FEATURE_NAMES)
+    assert_same_features(store, rebuilt(tmp_path, close.iloc[:n_days]))
@@ -0,0 +1,80 @@
+import os
+import multiprocessing
+import threading
+import numpy as np
+import pandas as pd
+
+from smartinvest.datadriver.manifest import Manifest, get_manifest
+from smartinvest.datadriver.storage import write_partition, compact_store, migrate_store, resolve_partition_file
+
+def make_partition(year, n_days=20):
+    index = pd.bdate_range(f'{year}-01-02', periods=n_days, name='time')
+    return pd.DataFrame({'Close': np.linspace(10, 20, n_days, dtype=np.float32),
+                         'Volume': np.arange(n_days) + 1000}, index=index)
+
+def write_stocks(data_folder, stocks, years, file_stem='20240101000000', storage_format='parquet'):
+    for stock in stocks:
+        for year in years:
+            write_partition(make_partition(year), os.path.join(data_folder, stock, str(year)), file_stem,
+                            storage_format=storage_format)
+
+def test_batch_saves_once(tmp_path):
+    data_folder = str(tmp_path)
+    manifest = get_manifest(data_folder)
+    with manifest.batch():
+        write_stocks(data_folder, ['AAA', 'BBB'], [2023, 2024])
+        # Nothing is saved until the batch exits
+        assert not manifest.exists()
+
+    data = Manifest(data_folder).load()
+    assert data['version'] == 1
+    assert sorted(data['stocks']) == ['AAA', 'BBB']
+    assert data['first_day'] == '2023-01-02'
+    assert data['stocks']['AAA']['rows'] == 40
+    assert all(p['version'] == 1 for p in data['stocks']['BBB']['partitions'].values())
+
+def test_batch_collects_writes_of_other_threads(tmp_path):
+    data_folder = str(tmp_path)
+    with get_manifest(data_folder).batch():
+        threads = [threading.Thread(target=write_stocks, args=(data_folder, [f'S{i}'], [2024])) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(Manifest(data_folder).stocks()) == 8
+
+def _write_in_process(data_folder, stocks):
+    write_stocks(data_folder, stocks, [2024])
+
+def test_concurrent_processes_keep_every_partition(tmp_path):
+    data_folder = str(tmp_path)
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_write_in_process, args=(data_folder, [f'P{i}{j}' for j in range(10)]))
+                 for i in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    data = Manifest(data_folder).load()
+    assert len(data['stocks']) == 30
+    assert data['version'] == 30
+
+def test_migrate_and_compact(tmp_path):
+    data_folder = str(tmp_path)
+    write_stocks(data_folder, ['AAA'], [2024], file_stem='20240101000000', storage_format='csv')
+    assert migrate_store(data_folder, 'parquet', remove_source=True) == 1
+    assert resolve_partition_file(data_folder, 'AAA', 2024).endswith('20240101000000.parquet')
+
+    # A newer snapshot with one revised day, merged by compaction
+    revised = make_partition(2024).iloc[-1:] * 2
+    write_partition(revised, os.path.join(data_folder, 'AAA', '2024'), '20240201000000')
+    version = Manifest(data_folder).load()['version']
+    assert compact_store(data_folder) == 1
+
+    data = Manifest(data_folder).load()
+    assert data['version'] == version + 1
+    entry = data['stocks']['AAA']['partitions']['2024']
+    assert entry['rows'] == 20
+    assert os.listdir(os.path.join(data_folder, 'AAA', '2024')) == [os.path.basename(entry['path'])]
@@ -0,0 +1,41 @@
+import os
+import json
+import numpy as np
+import pytest
+
+from smartinvest.predictor.numpy_backend import NumpyModel, export_keras_model
+
+MODEL_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'smartinvest', 'model')
+SHIPPED_MODELS = ['exp_1.4_20250518.keras', 'exp_1.4_20240715.h5']
+
+@pytest.mark.parametrize('model_file', SHIPPED_MODELS)
+def test_numpy_backend_matches_keras(model_file, tmp_path):
+    pytest.importorskip('tensorflow')
+    from smartinvest.predictor.prediction import load_keras_model
+
+    keras_model = load_keras_model(os.path.join(MODEL_FOLDER, model_file))
+    npz_path = str(tmp_path / 'model.npz')
+    export_keras_model(keras_model, npz_path)
+    numpy_model = NumpyModel(npz_path)
+    assert numpy_model.input_shape[1:] == tuple(keras_model.input_shape[1:])
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(0, 0.02, (4,) + tuple(keras_model.input_shape[1:])).astype(np.float32)
+    expected = keras_model.predict(X, verbose=0)
+    np.testing.assert_allclose(numpy_model.predict(X), expected, atol=1e-5)
+
+def test_conv1d_strides_and_dilation(tmp_path):
+    rng = np.random.default_rng(1)
+    kernel = rng.normal(size=(3, 4, 2)).astype(np.float32)
+    bias = rng.normal(size=2).astype(np.float32)
+    layers = [{'type': 'conv1d', 'name': 'l0', 'strides': 2, 'dilation_rate': 2, 'activation': 'linear'},
+              {'type': 'flatten', 'name': 'l1'}]
+    npz_path = str(tmp_path / 'conv.npz')
+    np.savez(npz_path, layers=np.array(json.dumps(layers)), l0_kernel=kernel, l0_bias=bias)
+
+    X = rng.normal(size=(2, 11, 4)).astype(np.float32)
+    # Output step t reads input steps 2t, 2t + 2, 2t + 4
+    expected = np.stack([
+        sum(X[:, 2*t + 2*j] @ kernel[j] for j in range(3)) + bias for t in range(4)
+    ], axis=1).reshape(2, -1)
+    np.testing.assert_allclose(NumpyModel(npz_path).predict(X), expected, rtol=1e-5, atol=1e-5)
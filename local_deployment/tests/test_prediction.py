@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from smartinvest.predictor import prediction
+from smartinvest.predictor.prediction import Predictor, WATCH_LIST
+from smartinvest.processing.feature_engineering import sliding_windows, get_X
+
+class ShortDataDriver:
+    """Feature store holding only a few days of returns, e.g. early in a new deployment."""
+    def __init__(self, n_days):
+        index = pd.bdate_range(f'{pd.Timestamp.now().year}-01-02', periods=n_days)
+        self.returns = pd.DataFrame(np.zeros((n_days, len(WATCH_LIST)), dtype=np.float32),
+                                    index=index, columns=WATCH_LIST)
+
+    def get_features(self, name, stocks, start=None, end=None, last=None):
+        returns = self.returns[list(stocks)].loc[start:end]
+        return returns if last is None else returns.iloc[-last:]
+
+class MeanModel:
+    input_shape = (None, 60, len(WATCH_LIST))
+
+    def predict(self, X, batch_size=None, verbose=0):
+        assert len(X)
+        return X.mean(axis=1)
+
+@pytest.fixture
+def predictor(monkeypatch):
+    monkeypatch.setattr(prediction, 'load_model', lambda path, backend: MeanModel())
+    return Predictor(ShortDataDriver(20), model_path='model.keras', backend='numpy')
+
+def test_short_input_has_no_window():
+    values = np.zeros((5, 3), dtype=np.float32)
+    assert sliding_windows(values, 10).shape == (0, 10, 3)
+    assert get_X(values, len_x=10).shape == (0, 10, 3)
+
+@pytest.mark.parametrize('latest_only', [True, False])
+def test_prediction_with_too_few_days(predictor, latest_only):
+    with pytest.raises(ValueError, match="Not enough data to predict"):
+        predictor.get_prediction(latest_only=latest_only)
+
+def test_backtest_predictions_with_too_few_days(predictor):
+    assert predictor.get_predictions_last_n(5).empty
+    assert predictor.get_predictions().empty
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from smartinvest.datadriver.feature_store import FeatureStore
+from smartinvest.predictor.prediction_cache import PredictionCache
+
+class FakeDataDriver:
+    """Feature store behind a manifest whose version moves before the features are updated."""
+    def __init__(self, data_folder):
+        self.feature_store = FeatureStore(data_folder, horizon=5)
+        self.manifest_version = 0
+
+    def data_version(self):
+        return self.manifest_version, None
+
+    def feature_version(self):
+        return self.feature_store.version()
+
+class FakePredictor:
+    model_path = 'missing.keras'
+    watch_list = ['A', 'B']
+
+    def __init__(self, data_driver):
+        self.data_driver = data_driver
+
+    def get_prediction(self):
+        returns = self.data_driver.feature_store.get('returns')
+        return pd.DataFrame({'stock': self.watch_list, 'last_date': returns.index[-1]})
+
+    def plot_predictions(self, result_df):
+        return ''
+
+def close_prices(n_days):
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range('2024-01-01', periods=n_days)
+    return pd.DataFrame(10 + rng.random((n_days, 2)).cumsum(axis=0), index=index, columns=['A', 'B'])
+
+def test_cache_key_follows_feature_store(tmp_path):
+    data_driver = FakeDataDriver(str(tmp_path))
+    close = close_prices(40)
+    data_driver.feature_store.update(close.iloc[:30])
+    cache = PredictionCache(FakePredictor(data_driver))
+    first, _ = cache.get()
+
+    # A refresh wrote new partitions, the features are not updated yet: a request
+    # in between still gets the predictions of the stored features
+    data_driver.manifest_version += 1
+    result, _ = cache.get()
+    assert result is first
+
+    data_driver.feature_store.update(close)
+    result, _ = cache.get()
+    assert result['last_date'].iloc[0] == close.index[-1]
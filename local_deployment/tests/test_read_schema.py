@@ -0,0 +1,65 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from smartinvest.datadriver.storage import write_partition
+from smartinvest.datadriver.data_processing import read_stocks, read_stocks_years
+
+STOCKS = ['VCB', 'FPT']
+YEARS = [2023, 2024]
+
+def make_partition(stock, year, seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(f'{year}-01-02', periods=30)
+    if stock == 'FPT':
+        # FPT misses a few days, so its volume has gaps in the panel
+        dates = dates[::2]
+    return pd.DataFrame({
+        'Open': rng.uniform(10, 20, len(dates)),
+        'High': rng.uniform(20, 30, len(dates)),
+        'Low': rng.uniform(5, 10, len(dates)),
+        'Close': rng.uniform(10, 20, len(dates)),
+        'Volume': rng.integers(1_000, 1_000_000, len(dates)),
+        'ticker': stock,
+    }, index=pd.DatetimeIndex(dates, name='time'))
+
+@pytest.fixture
+def data_folder(tmp_path):
+    for seed, (stock, year) in enumerate((s, y) for s in STOCKS for y in YEARS):
+        write_partition(make_partition(stock, year, seed), os.path.join(tmp_path, stock, str(year)),
+                        'download', storage_format='parquet')
+    return str(tmp_path)
+
+@pytest.mark.parametrize('low_memory', [False, True])
+def test_read_stocks_years_keeps_schema(data_folder, low_memory):
+    data = read_stocks_years(STOCKS, data_folder, years=YEARS, n_workers=1, low_memory=low_memory)
+    assert data.index.year.unique().tolist() == YEARS
+
+    volume_dtype = 'int32' if low_memory else 'int64'
+    for stock in STOCKS:
+        for col in ['Open', 'High', 'Low', 'Close']:
+            assert data[(col, stock)].dtype == np.float32
+        assert isinstance(data[('ticker', stock)].dtype, pd.CategoricalDtype)
+    assert data[('Volume', 'VCB')].dtype == volume_dtype
+    # Days FPT did not trade stay missing in a nullable integer column
+    assert data[('Volume', 'FPT')].dtype == volume_dtype.capitalize()
+    assert data[('Volume', 'FPT')].isna().any()
+
+def test_read_stocks_keeps_schema(data_folder):
+    data = read_stocks(STOCKS, 2024, data_folder, low_memory=True)
+    assert data[('Close', 'FPT')].dtype == np.float32
+    assert data[('Volume', 'FPT')].dtype == 'Int32'
+    assert isinstance(data[('ticker', 'VCB')].dtype, pd.CategoricalDtype)
+
+@pytest.mark.parametrize('storage_format', ['csv', 'parquet', 'feather'])
+def test_gapped_volume_round_trips_exactly(tmp_path, storage_format):
+    data = make_partition('VCB', 2024, 0)
+    data['Volume'] = pd.array([23_456_789, None] + [2**40 + i for i in range(len(data) - 2)], dtype='Int64')
+    write_partition(data, os.path.join(tmp_path, 'VCB', '2024'), 'download',
+                    storage_format=storage_format)
+
+    volume = read_stocks_years(['VCB'], str(tmp_path), years=[2024], n_workers=1)[('Volume', 'VCB')]
+    assert volume.dtype == 'Int64'
+    pd.testing.assert_series_equal(volume, data['Volume'], check_names=False, check_index_type=False,
+                                   check_freq=False)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from smartinvest.simulator.backtest import signal_weights, backtest, summarize
+from smartinvest.simulator.simulator import RingBuffer
+
+def test_top_k_weights():
+    signals = np.array([[0.3, np.nan, 0.1, 0.2, -0.1],
+                        [np.nan, np.nan, np.nan, 0.5, np.nan]])
+    weights = signal_weights(signals, top_k=2)
+    np.testing.assert_allclose(weights, [[0.5, 0, 0, 0.5, 0], [0, 0, 0, 1, 0]])
+
+    weights = signal_weights(signals, top_k=2, long_short=True)
+    np.testing.assert_allclose(weights, [[0.5, 0, -0.5, 0.5, -0.5], [0, 0, 0, 1, 0]])
+
+    weights = signal_weights(signals, top_k=None)
+    np.testing.assert_allclose(weights, [[0.5, 0, 1 / 6, 1 / 3, 0], [0, 0, 0, 1, 0]])
+
+def test_backtest_lag_rebalance_and_cost():
+    index = pd.bdate_range('2024-01-01', periods=6)
+    returns = pd.DataFrame({'A': 0.01, 'B': -0.02}, index=index)
+    # A is the best stock on the first two days, B afterwards
+    signals = pd.DataFrame({'A': [1, 1, 0, 0, 0, 0], 'B': [0, 0, 1, 1, 1, 1]}, index=index, dtype=float)
+
+    result = backtest(signals, returns, top_k=1, rebalance=2, lag=1, cost=0.001)
+    np.testing.assert_allclose(result.positions['A'], [0, 1, 1, 0, 0, 0])
+    np.testing.assert_allclose(result.positions['B'], [0, 0, 0, 1, 1, 1])
+    np.testing.assert_allclose(result.turnover, [0, 1, 0, 2, 0, 0])
+    expected = np.array([0, 0.01, 0.01, -0.02, -0.02, -0.02]) - 0.001 * result.turnover.to_numpy()
+    np.testing.assert_allclose(result.returns, expected)
+    np.testing.assert_allclose(result.equity, np.cumprod(1 + expected))
+
+def test_summarize():
+    daily = np.array([0.1, -0.5, 0.2])
+    equity = np.cumprod(1 + daily)
+    stats = summarize(daily, equity, np.ones(3))
+    assert stats['total_return'] == pytest.approx(equity[-1] - 1)
+    assert stats['max_drawdown'] == pytest.approx(-0.5)
+    assert stats['mean_turnover'] == 1.0
+    assert summarize(np.array([]), np.array([]), np.array([])) == {}
+
+def test_ring_buffer_window():
+    buffer = RingBuffer(3, 2)
+    assert buffer.window().shape == (0, 2)
+    for i in range(7):
+        buffer.append([i, -i])
+        n = min(i + 1, 3)
+        np.testing.assert_array_equal(buffer.window()[:, 0], np.arange(i + 1 - n, i + 1))
+
+    window = buffer.window()
+    assert not window.flags.writeable
+    # A view of the buffer, not a copy
+    assert np.shares_memory(window, buffer._buffer)
@@ -0,0 +1,66 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+
+from smartinvest.processing.window_dataset import WindowDataset
+
+LEN_X = 10
+HORIZON = 5
+
+def make_dataset(**kwargs):
+    n_days, n_stocks = 200, 3
+    dates = pd.bdate_range('2024-01-01', periods=n_days)
+    # Row r of the returns holds r, so a window tells its start row
+    returns = np.repeat(np.arange(n_days, dtype=np.float32)[:, None], n_stocks, axis=1)
+    targets = returns + 0.5
+    targets[-HORIZON:] = np.nan
+    kwargs = dict(dict(len_x=LEN_X, horizon=HORIZON, batch_size=16, seed=0), **kwargs)
+    return WindowDataset(returns, targets, dates, **kwargs), dates
+
+def prefetch_threads():
+    return [t for t in threading.enumerate() if t.name == 'WindowDataset-prefetch']
+
+def wait_for_no_prefetch_threads(timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while prefetch_threads() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return not prefetch_threads()
+
+def test_split_boundaries():
+    dataset, dates = make_dataset(start='2024-02-01', end='2024-06-28')
+    first_row = dates.searchsorted(pd.Timestamp('2024-02-01'))
+    last_row = dates.searchsorted(pd.Timestamp('2024-06-28'))
+    assert dataset.starts.min() == first_row
+    # The target of the last window is measured `horizon` days after its end, on or before `end`
+    assert dataset.starts.max() + LEN_X - 1 + HORIZON == last_row
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+def test_epoch_covers_every_window_once(prefetch):
+    dataset, _ = make_dataset(prefetch=prefetch)
+    batches = list(dataset)
+    assert len(batches) == len(dataset)
+    X = np.concatenate([X for X, _ in batches])
+    y = np.concatenate([y for _, y in batches])
+    assert sorted(X[:, 0, 0]) == sorted(dataset.starts)
+    np.testing.assert_array_equal(y[:, 0], X[:, -1, 0] + 0.5)
+
+def test_close_stops_prefetch_of_repeat():
+    dataset, _ = make_dataset(prefetch=2)
+    train = dataset.repeat()
+    # Like Keras fit, stop pulling in the middle of an epoch while the queue is full
+    for _ in range(3):
+        next(train)
+    time.sleep(0.2)
+    assert prefetch_threads()
+    dataset.close()
+    assert wait_for_no_prefetch_threads()
+
+def test_closing_the_iterator_stops_prefetch():
+    dataset, _ = make_dataset(prefetch=2)
+    with dataset:
+        batches = iter(dataset)
+        next(batches)
+        batches.close()
+        assert wait_for_no_prefetch_threads()
@@ -0,0 +1,210 @@
+"""
+Parallel sweep over the window length, horizon, number of stocks, LSTM width and batch size.
+
+The returns and the targets of every horizon, read from the feature store, are
+put once in shared memory. Each worker process maps them instead of receiving a
+pickled copy per config.
+Finished configs are appended to a .jsonl file, so an interrupted sweep resumes
+where it stopped.
+
+Usage (from local_deployment/):
+    python train/sweep.py --len-x 60 120 --horizon 30 --n-stock 22 90 --units 64 120 --workers 4
+"""
+import os
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from smartinvest.processing.window_dataset import WindowDataset
+from smartinvest.processing.shared_arrays import share_array, attach_array
+
+PARAMS = ['len_x', 'horizon', 'n_stock', 'units', 'batch_size']
+
+# Arrays mapped from shared memory in each worker, set by `_attach`
+_shared = {}
+
+def make_grid(**values):
+    """
+    Build every combination of the parameter values.
+
+    Returns:
+        list: Config dicts with the keys of PARAMS
+    """
+    return [dict(zip(PARAMS, combo)) for combo in itertools.product(*(values[p] for p in PARAMS))]
+
+def config_key(config):
+    return '|'.join(f"{p}={config[p]}" for p in PARAMS)
+
+def _attach(specs, dates):
+    """
+    Worker initializer: map the shared arrays without copying them.
+    """
+    _shared['dates'] = dates
+    for name, spec in specs.items():
+        _shared[f"{name}_shm"], _shared[name] = attach_array(spec)
+
+def fit_and_score(config, data_train, data_valid, data_test, epochs, patience):
+    """
+    Train the training.py model on one config and score it.
+
+    Returns:
+        dict: epochs, valid_loss and the test metrics
+    """
+    import tensorflow as tf
+    from training import build_model
+    from walk_forward import evaluate
+
+    # Every worker gets a share of the cores instead of all of them
+    tf.config.threading.set_intra_op_parallelism_threads(1)
+    model = build_model(config['len_x'], config['n_stock'], units=config['units'])
+    early_stopping = tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience, mode='min',
+                                                      restore_best_weights=True)
+    # Stop the prefetch threads once fit stops pulling from repeat()
+    with data_train, data_valid:
+        history = model.fit(data_train.repeat(), steps_per_epoch=len(data_train), epochs=epochs,
+                            validation_data=data_valid.repeat(), validation_steps=len(data_valid),
+                            callbacks=[early_stopping], verbose=0)
+    return {'epochs': len(history.history['loss']), 'valid_loss': float(min(history.history['val_loss'])),
+            **evaluate(model, data_test)}
+
+def run_config(config, train_split, test_split, epochs, patience):
+    """
+    Evaluate one config in a worker, on the arrays mapped by `_attach`.
+
+    Returns:
+        dict: Config, window counts, scores and timings
+    """
+    start = time.perf_counter()
+    n_stock, len_x = config['n_stock'], config['len_x']
+    returns = _shared['returns'][:, :n_stock]
+    targets = _shared[f"targets_{config['horizon']}"][:, :n_stock]
+    kwargs = dict(dates=_shared['dates'], len_x=len_x, horizon=config['horizon'], batch_size=config['batch_size'])
+    data_train = WindowDataset(returns, targets, end=train_split, **kwargs)
+    data_valid = WindowDataset(returns, targets, start=train_split, end=test_split, shuffle=False, **kwargs)
+    data_test = WindowDataset(returns, targets, start=test_split, shuffle=False, prefetch=0, **kwargs)
+    record = {**config, 'n_train': data_train.n_windows, 'n_valid': data_valid.n_windows,
+              'n_test': data_test.n_windows}
+    record['dataset_seconds'] = time.perf_counter() - start
+
+    if data_train.n_windows and data_valid.n_windows:
+        start = time.perf_counter()
+        record.update(fit_and_score(config, data_train, data_valid, data_test, epochs, patience))
+        record['fit_seconds'] = time.perf_counter() - start
+    return record
+
+def load_results(results_path):
+    """
+    Read the configs already finished by a previous run.
+
+    Returns:
+        dict: Config key -> result record
+    """
+    done = {}
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                # A run killed mid-write leaves a partial last line
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                done[config_key(record)] = record
+    return done
+
+def run_sweep(returns, targets, grid, results_path, train_split, test_split, n_workers=None, epochs=60, patience=5,
+              mp_context='spawn'):
+    """
+    Evaluate every config of the grid in a process pool, skipping those already in `results_path`.
+
+    Args:
+        returns (pd.DataFrame): Returns from the feature store, shape n_days x m_stock
+        targets (dict): Horizon -> targets from the feature store, same shape as `returns`
+        grid (list): Configs from `make_grid`
+        results_path (str): .jsonl file the results are appended to
+        train_split (str): Last day of the train period
+        test_split (str): First day of the test period
+        n_workers (int, optional): Number of processes. If None, uses the number of CPUs
+        mp_context (str): Start method of the processes. 'spawn' is safe with TensorFlow
+
+    Returns:
+        pd.DataFrame: One row per config, sorted by the test MAE
+    """
+    done = load_results(results_path)
+    todo = [config for config in grid if config_key(config) not in done]
+    print(f"SWEEP: {len(grid)} configs, {len(grid) - len(todo)} already done")
+
+    blocks = []
+    try:
+        arrays = {'returns': returns.to_numpy()}
+        for horizon in sorted({config['horizon'] for config in todo}):
+            arrays[f"targets_{horizon}"] = targets[horizon].to_numpy()
+        specs = {}
+        for name, array in arrays.items():
+            shm, specs[name] = share_array(array)
+            blocks.append(shm)
+        del arrays
+
+        dates = pd.to_datetime(returns.index)
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context(mp_context),
+                                 initializer=_attach, initargs=(specs, dates)) as pool:
+            futures = {pool.submit(run_config, config, train_split, test_split, epochs, patience): config
+                       for config in todo}
+            with open(results_path, 'a') as f:
+                for future in as_completed(futures):
+                    config = futures[future]
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        print(f"CONFIG FAILED {config_key(config)}: {str(e)}")
+                        continue
+                    f.write(json.dumps(record) + '\n')
+                    f.flush()
+                    done[config_key(config)] = record
+                    print(f"CONFIG DONE {config_key(config)}: MAE {record.get('mae')}, "
+                          f"{record.get('fit_seconds', 0):.1f}s")
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame([done[config_key(config)] for config in grid if config_key(config) in done])
+    if 'mae' in results:
+        results = results.sort_values('mae')
+    return results
+
+def main():
+    from smartinvest import DataDriver
+    from training import l_stock, train_split, test_split
+
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep of the prediction model")
+    parser.add_argument('--data-folder', default='data')
+    parser.add_argument('--start', default='2019-01-01')
+    parser.add_argument('--end', default='2022-12-31')
+    parser.add_argument('--len-x', type=int, nargs='+', default=[60, 120])
+    parser.add_argument('--horizon', type=int, nargs='+', default=[30])
+    parser.add_argument('--n-stock', type=int, nargs='+', default=[len(l_stock)])
+    parser.add_argument('--units', type=int, nargs='+', default=[120])
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[128])
+    parser.add_argument('--epochs', type=int, default=60)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--results', default='sweep_results.jsonl')
+    args = parser.parse_args()
+
+    data_driver = DataDriver(data_folder=args.data_folder)
+    returns = data_driver.get_features('returns', l_stock, start=args.start, end=args.end)
+    targets = {horizon: data_driver.feature_store.get_targets(horizon, l_stock, start=args.start, end=args.end)
+               for horizon in args.horizon}
+    grid = make_grid(len_x=args.len_x, horizon=args.horizon, n_stock=args.n_stock, units=args.units,
+                     batch_size=args.batch_size)
+    results = run_sweep(returns, targets, grid, args.results, train_split, test_split, args.workers, args.epochs)
+    table_path = os.path.splitext(args.results)[0] + '.csv'
+    results.to_csv(table_path, index=False)
+    print(results.to_string())
+    print(f"SWEEP RESULTS SAVED TO {table_path}")
+
+if __name__ == '__main__':
+    main()
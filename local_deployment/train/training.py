@@ -6,11 +6,11 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
-from skimage.util import view_as_windows
 from sklearn.metrics import mean_absolute_error
 import tensorflow as tf
 
-from smartinvest.datadriver.data_processing import read_stocks_years
+from smartinvest import DataDriver
+from smartinvest.processing.window_dataset import WindowDataset
 
 import vnstock
 
@@ -27,83 +27,58 @@ l_stock = ['ACB', 'BAB', 'BBS', 'BCM', 'BID', 'BSR', 'BVH', 'BWE', 'CCT',
        'VIB', 'VIC', 'VIX', 'VJC', 'VND', 'VNM', 'VPB', 'VPI', 'VRE',
        'VSH', 'VTP']
 
-data = read_stocks_years(l_stock, year_from=2019, year_to=2022)
-
-def get_X_y(series):
-    """Return a windowed X, y from a timeseries `series`
-    Args:
-        series: pandas dataframe, shape n_days x m_stock
-    Returns:
-        X, y
-    """
-    # Data to train is the change percentage of the sotck values
-    to_train = copy.deepcopy(series)
-    to_train = to_train.diff(1)/to_train.shift(1)
-
-    target_30d = copy.deepcopy(series)
-    target_30d = -target_30d.diff(-30)/target_30d
-
-    # Model params
-    len_x = 120 #day(s)
-    n_stock = 22 #stocks
-    step  = 1   #day(s)
-
-    X_full = view_as_windows(to_train.values, window_shape = (len_x, n_stock), step=step)
-    X_full = np.squeeze(X_full)
-    # Shape: (n_days , len_X, n_stocks)
-
-    n_days = X_full.shape[0]
-
-    # Remove the first 1 rows due to 1 day in diff(1) for the X <br>
-    # and last 30 rows due to 29 day in diff(-30) for the y
-    X = X_full[1:-30]
-    y = target_30d.values[len_x:-30]
-
-    # Remove nan values
-    x_not_null = ~np.isnan(X).any(axis=1).any(axis=1)
-    y_not_null = ~np.isnan(y).any(axis=1)
-
-    not_null = x_not_null & y_not_null
-
-    return X[not_null], y[not_null]
-
+LEN_X = 120
+BATCH_SIZE = 128
 
 train_split = '2020-12-31'
 test_split = '2022-01-01'
-data_train = data[["Close"]][data.index <= train_split]
-data_valid = data[["Close"]][ (data.index > train_split)&((data.index < test_split))]
-data_test = data[["Close"]][data.index >= test_split]
-
-X_train, y_train = get_X_y( data_train )
-X_valid, y_valid = get_X_y( data_valid )
-X_test, y_test   = get_X_y( data_test )
-
-input_with = 120
-num_label = y_train.shape[-1]
-
-model = tf.keras.models.Sequential([
-    tf.keras.layers.Bidirectional(
-        tf.keras.layers.LSTM( input_with, return_sequences=0)),
-    # tf.keras.layers.BatchNormalization(),
-    # tf.keras.layers.Dense( out_steps*num_label*4, activation='relu' ),
-    # tf.keras.layers.Dropout(0.5),
-    tf.keras.layers.Dense( num_label, activation=None ),
-    tf.keras.layers.Dropout(0.5),
-    tf.keras.layers.Dense( num_label)
-])
-
-MAX_EPOCHS = 60
-patience=5
-early_stopping = tf.keras.callbacks.EarlyStopping(monitor='val_loss',
-                                                patience=patience,
-                                                mode='min')
-
-model.compile(loss='mse',
-            optimizer=tf.optimizers.Adam(clipvalue=0.1, learning_rate=0.001),
-            metrics=[tf.metrics.MeanAbsoluteError()])
-
-history = model.fit(X_train,y_train, epochs=MAX_EPOCHS, batch_size=128,
-                    validation_data = (X_valid, y_valid),
-                    callbacks=[early_stopping], verbose= 1)
 
-y_test_pred = model.predict(X_test)
\ No newline at end of file
+def build_model(input_with, num_label, units=None):
+    # The LSTM width defaults to the window length
+    model = tf.keras.models.Sequential([
+        tf.keras.layers.Bidirectional(
+            tf.keras.layers.LSTM( units or input_with, return_sequences=0)),
+        # tf.keras.layers.BatchNormalization(),
+        # tf.keras.layers.Dense( out_steps*num_label*4, activation='relu' ),
+        # tf.keras.layers.Dropout(0.5),
+        tf.keras.layers.Dense( num_label, activation=None ),
+        tf.keras.layers.Dropout(0.5),
+        tf.keras.layers.Dense( num_label)
+    ])
+    model.compile(loss='mse',
+                optimizer=tf.optimizers.Adam(clipvalue=0.1, learning_rate=0.001),
+                metrics=[tf.metrics.MeanAbsoluteError()])
+    return model
+
+def main():
+    data_driver = DataDriver(data_folder='data')
+
+    # Windows are read in batches from the returns and targets of the feature store
+    data_train = WindowDataset.from_features(data_driver, l_stock, len_x=LEN_X, start='2019-01-01', end=train_split,
+                                             batch_size=BATCH_SIZE)
+    data_valid = WindowDataset.from_features(data_driver, l_stock, len_x=LEN_X, start=train_split, end=test_split,
+                                             batch_size=BATCH_SIZE, shuffle=False)
+    data_test = WindowDataset.from_features(data_driver, l_stock, len_x=LEN_X, start=test_split, end='2022-12-31',
+                                            batch_size=BATCH_SIZE, shuffle=False, prefetch=0)
+
+    model = build_model(LEN_X, len(l_stock))
+
+    MAX_EPOCHS = 60
+    patience=5
+    early_stopping = tf.keras.callbacks.EarlyStopping(monitor='val_loss',
+                                                    patience=patience,
+                                                    mode='min')
+
+    # Stop the prefetch threads once fit stops pulling from repeat()
+    with data_train, data_valid:
+        history = model.fit(data_train.repeat(), steps_per_epoch=len(data_train), epochs=MAX_EPOCHS,
+                            validation_data=data_valid.repeat(), validation_steps=len(data_valid),
+                            callbacks=[early_stopping], verbose= 1)
+
+    y_test = np.concatenate([y for _, y in data_test])
+    y_test_pred = np.concatenate([model.predict(X, verbose=0) for X, _ in data_test])
+    print(f"TEST MAE: {mean_absolute_error(y_test, y_test_pred):.5f}")
+    return model, history
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Walk-forward retraining: train/valid/test windows advance over time, one model per fold.
+
+Every fold is trained on the days before its valid window, early-stopped on the
+valid window and evaluated on the following test window. The returns and targets
+come from the feature store of the data folder, so a new run only computes the
+days added since the previous one.
+
+Each fold writes a versioned model that Predictor can load:
+    smartinvest/model/walk_forward/wf_<test_start>_<run_time>.keras
+    smartinvest/model/walk_forward/wf_<test_start>_<run_time>.json   stocks, len_x, fold dates, metrics
+
+Usage (from local_deployment/):
+    python train/walk_forward.py --start 2019-01-01 --valid-days 120 --test-days 60
+"""
+import os
+import json
+import time
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+
+from smartinvest import DataDriver
+from smartinvest.processing.window_dataset import WindowDataset
+
+from training import l_stock, build_model, LEN_X, BATCH_SIZE
+
+MODEL_FOLDER = 'smartinvest/model/walk_forward'
+
+def walk_forward_folds(dates, train_days=500, valid_days=120, test_days=60, step_days=None, expanding=True):
+    """
+    Split trading days into successive (train, valid, test) folds.
+
+    Args:
+        dates (pd.DatetimeIndex): Trading days
+        train_days (int): Number of days of the first train window
+        valid_days (int): Number of days of each valid window
+        test_days (int): Number of days of each test window
+        step_days (int, optional): Days between two folds. If None, uses `test_days`
+            so the test windows do not overlap
+        expanding (bool): If True, the train window always starts on the first day,
+            otherwise it keeps `train_days` days
+
+    Returns:
+        list: Dicts with the train_start, train_end, valid_start, valid_end, test_start,
+            test_end dates of each fold
+    """
+    step_days = step_days or test_days
+    folds = []
+    train_end = train_days
+    while train_end + valid_days + test_days <= len(dates):
+        train_start = 0 if expanding else train_end - train_days
+        folds.append({
+            'train_start': dates[train_start],
+            'train_end': dates[train_end - 1],
+            'valid_start': dates[train_end],
+            'valid_end': dates[train_end + valid_days - 1],
+            'test_start': dates[train_end + valid_days],
+            'test_end': dates[train_end + valid_days + test_days - 1],
+        })
+        train_end += step_days
+    return folds
+
+def evaluate(model, dataset):
+    """
+    Score a model on every window of a dataset.
+
+    Returns:
+        dict: mae, mse and hit_rate (share of predictions with the sign of the target)
+    """
+    y_true, y_pred = [], []
+    for X, y in dataset:
+        y_true.append(y)
+        y_pred.append(model.predict(X, verbose=0))
+    if not y_true:
+        return {'mae': None, 'mse': None, 'hit_rate': None}
+    y_true, y_pred = np.concatenate(y_true), np.concatenate(y_pred)
+    error = y_pred - y_true
+    return {
+        'mae': float(np.abs(error).mean()),
+        'mse': float((error ** 2).mean()),
+        'hit_rate': float((np.sign(y_pred) == np.sign(y_true)).mean()),
+    }
+
+def run_fold(fold, returns, targets, horizon, model_folder=MODEL_FOLDER, run_time=None,
+             len_x=LEN_X, batch_size=BATCH_SIZE, epochs=60, patience=5):
+    """
+    Train, evaluate and save the model of one fold.
+
+    Args:
+        fold (dict): Fold dates from `walk_forward_folds`
+        returns (pd.DataFrame): Returns from the feature store, one column per stock
+        targets (pd.DataFrame): Targets from the feature store, same shape as `returns`
+        horizon (int): Number of days ahead the targets are measured
+
+    Returns:
+        dict: Fold dates, number of windows, metrics, timings and model path
+    """
+    import tensorflow as tf
+
+    start = time.perf_counter()
+    stocks = list(returns.columns)
+    dates = returns.index
+
+    def window_start(day):
+        # Valid and test windows end inside their period, their first days are past data
+        return dates[max(dates.searchsorted(day) - len_x + 1, 0)]
+
+    # Each split stops the targets (`horizon` days after the window end) at its own end
+    kwargs = dict(dates=dates, len_x=len_x, horizon=horizon, batch_size=batch_size)
+    returns, targets = returns.to_numpy(), targets.to_numpy()
+    data_train = WindowDataset(returns, targets, start=fold['train_start'], end=fold['train_end'], **kwargs)
+    data_valid = WindowDataset(returns, targets, start=window_start(fold['valid_start']), end=fold['valid_end'],
+                               shuffle=False, **kwargs)
+    data_test = WindowDataset(returns, targets, start=window_start(fold['test_start']), end=fold['test_end'],
+                              shuffle=False, prefetch=0, **kwargs)
+    record = {k: v.strftime('%Y-%m-%d') for k, v in fold.items()}
+    record.update({'n_train': data_train.n_windows, 'n_valid': data_valid.n_windows, 'n_test': data_test.n_windows})
+    if not data_train.n_windows or not data_valid.n_windows:
+        print(f"SKIP FOLD {record['test_start']}: not enough windows")
+        return record
+    dataset_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model = build_model(len_x, len(stocks))
+    early_stopping = tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience, mode='min',
+                                                      restore_best_weights=True)
+    # Stop the prefetch threads once fit stops pulling from repeat()
+    with data_train, data_valid:
+        history = model.fit(data_train.repeat(), steps_per_epoch=len(data_train), epochs=epochs,
+                            validation_data=data_valid.repeat(), validation_steps=len(data_valid),
+                            callbacks=[early_stopping], verbose=0)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    record.update(evaluate(model, data_test))
+    eval_time = time.perf_counter() - start
+
+    run_time = run_time or datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    model_path = os.path.join(model_folder, f"wf_{fold['test_start'].strftime('%Y%m%d')}_{run_time}.keras")
+    os.makedirs(model_folder, exist_ok=True)
+    model.save(model_path)
+    record.update({
+        'epochs': len(history.history['loss']),
+        'dataset_seconds': dataset_time,
+        'fit_seconds': fit_time,
+        'eval_seconds': eval_time,
+        'model_path': model_path,
+    })
+    # Predictor reads this file to use the same stocks and window length as the training
+    with open(os.path.splitext(model_path)[0] + '.json', 'w') as f:
+        json.dump({'stocks': stocks, 'len_x': len_x, 'horizon': horizon, **record}, f, indent=1)
+    print(f"FOLD {record['test_start']} -> {record['test_end']}: MAE {record['mae']}, "
+          f"{record['epochs']} epochs in {fit_time:.1f}s, saved to {model_path}")
+    return record
+
+def run_walk_forward(stocks, data_folder='data', start=None, end=None, model_folder=MODEL_FOLDER,
+                     train_days=500, valid_days=120, test_days=60, step_days=None, expanding=True, **fold_kwargs):
+    """
+    Update the feature store and run every walk-forward fold.
+
+    Returns:
+        pd.DataFrame: One row per fold with its metrics and timings
+    """
+    start_time = time.perf_counter()
+    data_driver = DataDriver(data_folder=data_folder)
+    n_computed = data_driver.update_features()
+    returns = data_driver.get_features('returns', stocks, start=start, end=end)
+    targets = data_driver.get_features('targets', stocks, start=start, end=end)
+    print(f"FEATURES: {n_computed} new days computed in {time.perf_counter() - start_time:.1f}s")
+
+    run_time = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    folds = walk_forward_folds(returns.index, train_days, valid_days, test_days, step_days, expanding)
+    records = [run_fold(fold, returns, targets, data_driver.feature_store.horizon, model_folder, run_time,
+                        **fold_kwargs) for fold in folds]
+    results = pd.DataFrame(records)
+
+    os.makedirs(model_folder, exist_ok=True)
+    results_path = os.path.join(model_folder, f"walk_forward_{run_time}.csv")
+    results.to_csv(results_path, index=False)
+    print(f"WALK FORWARD RESULTS SAVED TO {results_path}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward retraining of the prediction model")
+    parser.add_argument('--data-folder', default='data')
+    parser.add_argument('--start', default='2019-01-01')
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--train-days', type=int, default=500)
+    parser.add_argument('--valid-days', type=int, default=120)
+    parser.add_argument('--test-days', type=int, default=60)
+    parser.add_argument('--step-days', type=int, default=None)
+    parser.add_argument('--rolling', action='store_true', help="keep a fixed-size train window")
+    parser.add_argument('--epochs', type=int, default=60)
+    parser.add_argument('--model-folder', default=MODEL_FOLDER)
+    args = parser.parse_args()
+
+    results = run_walk_forward(l_stock, args.data_folder, args.start, args.end, args.model_folder,
+                               args.train_days, args.valid_days, args.test_days, args.step_days,
+                               expanding=not args.rolling, epochs=args.epochs)
+    print(results.to_string())
+
+if __name__ == '__main__':
+    main()